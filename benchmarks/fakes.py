@@ -0,0 +1,136 @@
+"""
+Minimal stand-ins for the discord.py objects the bot's entry points touch
+
+Only the attributes and coroutines the cogs, views and scheduler actually
+use are implemented. Network calls are no-ops unless a transport is set,
+in which case they go through its simulated latency and rate limits.
+"""
+import itertools
+
+_ids = itertools.count(10**17)
+
+# Optional simulated Discord API, see benchmarks.loadgen.FakeDiscordHTTP
+transport = None
+
+async def _request(route, resource_id=None):
+    if transport is not None:
+        await transport.request(route, resource_id)
+
+def next_id():
+    return next(_ids)
+
+class FakeUser:
+    def __init__(self, user_id=None, name="bench-user"):
+        self.id = user_id or next_id()
+        self.global_name = name
+        self.display_name = name
+        self.dm_channel = None
+    
+    async def create_dm(self):
+        await _request("dm.create")
+        self.dm_channel = FakeChannel(recipient=self)
+        return self.dm_channel
+    
+    async def send(self, *args, **kwargs):
+        channel = self.dm_channel or await self.create_dm()
+        return await channel.send(*args, **kwargs)
+
+class FakeGuild:
+    def __init__(self, guild_id=None):
+        self.id = guild_id or next_id()
+        self.members = {}
+        self.channels = {}
+    
+    def get_member(self, user_id):
+        return self.members.get(user_id)
+    
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+class FakeMessage:
+    def __init__(self, content="", channel=None, author=None, guild=None):
+        self.id = next_id()
+        self.content = content
+        self.channel = channel
+        self.author = author
+        self.guild = guild
+        self.edits = 0
+    
+    async def edit(self, **kwargs):
+        await _request("message.edit", self.channel.id if self.channel else None)
+        self.edits += 1
+        return self
+    
+    async def delete(self):
+        await _request("message.delete", self.channel.id if self.channel else None)
+
+class FakeChannel:
+    def __init__(self, guild=None, recipient=None):
+        self.id = next_id()
+        self.guild = guild
+        self.recipient = recipient
+        self.sent = 0
+        if guild:
+            guild.channels[self.id] = self
+    
+    async def send(self, content=None, **kwargs):
+        await _request("channel.send", self.id)
+        self.sent += 1
+        return FakeMessage(content or "", channel=self, guild=self.guild)
+    
+    async def fetch_message(self, message_id):
+        await _request("message.fetch", self.id)
+        return FakeMessage(channel=self, guild=self.guild)
+
+class FakeResponse:
+    def __init__(self):
+        self.calls = 0
+        self.view = None
+        self._done = False
+    
+    def is_done(self):
+        return self._done
+    
+    async def _respond(self, *args, **kwargs):
+        await _request("interaction.respond")
+        self.calls += 1
+        self.view = kwargs.get("view", self.view)
+        self._done = True
+    
+    send_message = _respond
+    edit_message = _respond
+    defer = _respond
+
+class FakeInteraction:
+    def __init__(self, user=None, guild=None, channel=None, message=None, data=None):
+        self.user = user or FakeUser()
+        self.guild = guild or FakeGuild()
+        self.guild_id = self.guild.id
+        self.channel = channel or FakeChannel(guild=self.guild)
+        self.message = message
+        self.data = data or {}
+        self.extras = {}
+        self.response = FakeResponse()
+        self._original = None
+    
+    async def original_response(self):
+        if self._original is None:
+            await _request("interaction.original")
+            self._original = FakeMessage(channel=self.channel, guild=self.guild)
+        return self._original
+
+class FakeBot:
+    """Covers what the scheduler needs from the bot for DM delivery"""
+    def __init__(self):
+        self.users = {}
+        self.user = FakeUser(name="Theseus")
+    
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+    
+    async def fetch_user(self, user_id):
+        await _request("user.fetch")
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = FakeUser(user_id)
+        return user
@@ -0,0 +1,98 @@
+"""
+Shared benchmark plumbing: environment setup, timing and result files
+"""
+import json
+import logging
+import os
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def setup_environment(mongo_uri):
+    """
+    Point the bot's modules at a benchmark database.
+
+    Must run before anything imports config or db.
+    """
+    os.environ["MONGO_CONN_STR"] = mongo_uri
+    os.environ["MONGO_DB_NAME"] = "theseus_bench"
+    os.environ.setdefault("GUILD_ID", "1")
+    os.environ.setdefault("BOT_TOKEN", "bench")
+
+def quiet_logging():
+    """Install the log pipeline at WARNING first so importing bot.py doesn't log every call"""
+    from utils import log_pipeline
+    log_pipeline.start(level=logging.WARNING, fmt="%(levelname)s %(name)s: %(message)s", path=os.devnull)
+
+def reset_database():
+    import db
+    for name in db.dbmanager.theseusdb.list_collection_names():
+        db.dbmanager.theseusdb.drop_collection(name)
+    db.dbmanager.ensure_unique_indexes()
+    db.dbmanager.ensure_indexes()
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(name, size, samples, elapsed):
+    return {
+        "name": name,
+        "size": size,
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000
+    }
+
+async def measure(name, size, op, iterations):
+    """Await op(i) for each iteration and summarize per-call latency"""
+    samples = []
+    started = time.perf_counter()
+    
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        await op(i)
+        samples.append(time.perf_counter() - t0)
+    
+    return summarize(name, size, samples, time.perf_counter() - started)
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+def save_results(results, path=None, **meta):
+    commit = current_commit()
+    path = path or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    
+    payload = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        **meta,
+        "results": results
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    
+    return path
+
+def print_results(results, baseline=None):
+    """Print a results table, with the change against a baseline file if given"""
+    previous = {}
+    if baseline:
+        with open(baseline) as f:
+            previous = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    
+    print(f"{'benchmark':<28}{'size':>9}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'vs base':>10}")
+    for r in results:
+        base = previous.get((r["name"], r["size"]))
+        delta = f"{(r['ops_per_sec'] / base['ops_per_sec'] - 1) * 100:+.1f}%" if base and base["ops_per_sec"] else ""
+        print(f"{r['name']:<28}{r['size']:>9}{r['ops_per_sec']:>12.1f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{delta:>10}")
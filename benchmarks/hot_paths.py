@@ -0,0 +1,178 @@
+"""
+Microbenchmarks for the bot's hot paths
+
+Drives on_message command dispatch, PollButton.callback, PollResultsButton.callback,
+reminder creation and missed-reminder recovery with fake discord objects
+against an in-process Mongo stand-in (mongomock) or a local mongod.
+
+Usage:
+    python -m benchmarks.hot_paths
+    python -m benchmarks.hot_paths --mongo-uri mongodb://localhost:27017 --compare benchmarks/results/abc123.json
+"""
+import argparse
+import asyncio
+import time
+from bson import ObjectId
+from benchmarks import harness
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeUser, next_id
+
+POLL_OPTIONS = ["Option A", "Option B", "Option C", "Option D"]
+
+def _parse_sizes(value):
+    return [int(size) for size in value.split(",") if size]
+
+def _seed_poll(voters):
+    """Create a poll with `voters` existing votes spread over its options"""
+    import db
+    
+    poll_id = db.polls_ops.create_poll_doc({
+        "question": "Benchmark poll",
+        "options": list(POLL_OPTIONS),
+        "creator_id": next_id(),
+        "channel_id": next_id(),
+        "poll_msg_id": str(next_id())
+    })
+    
+    poll_oid = ObjectId(poll_id)
+    counts = {str(i): 0 for i in range(len(POLL_OPTIONS))}
+    docs = []
+    for user_id in range(1, voters + 1):
+        option = str(user_id % len(POLL_OPTIONS))
+        counts[option] += 1
+        docs.append({"poll_id": poll_oid, "user_id": user_id, "option": option})
+    
+    if docs:
+        db.dbmanager.poll_votes_collection.insert_many(docs)
+    db.dbmanager.polls_collection.update_one({"_id": poll_oid}, {"$set": {"counts": counts, "total_votes": voters}})
+    
+    return poll_id
+
+async def bench_on_message(size, iterations):
+    import db
+    import bot as bot_module
+    
+    harness.reset_database()
+    guild = FakeGuild()
+    db.dbmanager.commands_collection.insert_many(
+        [{"guild_id": guild.id, "command_name": f"cmd{i}", "message": f"reply {i}"} for i in range(size)]
+    )
+    db.custom_commands_ops.load_command_registry()
+    
+    channel = FakeChannel(guild=guild)
+    author = FakeUser()
+    
+    async def op(i):
+        # Alternate hits and misses, misses still pay for the lookup
+        name = f"cmd{i % size}" if i % 2 == 0 else f"missing{i}"
+        await bot_module.on_message(FakeMessage(f"!{name}", channel=channel, author=author, guild=guild))
+    
+    return await harness.measure("on_message", size, op, iterations)
+
+async def bench_vote(size, iterations):
+    from ui.PollView import PollView
+    
+    harness.reset_database()
+    poll_id = _seed_poll(size)
+    guild = FakeGuild()
+    view = PollView(poll_id, list(POLL_OPTIONS))
+    buttons = view.children[:len(POLL_OPTIONS)]
+    poll_message = FakeMessage(guild=guild)
+    
+    async def op(i):
+        # New voters, so every click is a real vote
+        interaction = FakeInteraction(user=FakeUser(size + 1 + i), guild=guild, message=poll_message)
+        await buttons[i % len(buttons)].callback(interaction)
+    
+    return await harness.measure("poll_vote", size, op, iterations)
+
+async def bench_show_results(size, iterations):
+    from ui.PollView import PollView
+    
+    harness.reset_database()
+    poll_id = _seed_poll(size)
+    guild = FakeGuild()
+    results_button = PollView(poll_id, list(POLL_OPTIONS)).children[-1]
+    
+    async def op(i):
+        await results_button.callback(FakeInteraction(guild=guild))
+    
+    return await harness.measure("poll_show_results", size, op, iterations)
+
+async def bench_create_reminder(size, iterations):
+    import db
+    
+    harness.reset_database()
+    now = int(time.time())
+    db.dbmanager.reminder_collection.insert_many([
+        {"userId": i, "time": now + 3600 + i, "job_id": f"seed{i}", "title": "t", "desc": "d"}
+        for i in range(size)
+    ])
+    
+    async def op(i):
+        await db.aio.reminder_ops.create_reminder(next_id(), "Benchmark", "reminder", now + 7200 + i)
+    
+    return await harness.measure("create_reminder", size, op, iterations)
+
+async def bench_missed_recovery(size, iterations):
+    import db
+    from utils import scheduler_utils
+    
+    harness.reset_database()
+    now = int(time.time())
+    db.dbmanager.reminder_collection.insert_many([
+        {"userId": i, "time": now - 3600 + (i % 3600), "job_id": f"missed{i}", "title": "t", "desc": "d"}
+        for i in range(size)
+    ])
+    
+    # Measure pipeline overhead, not the Discord DM rate limit
+    scheduler_utils.set_bot_instance(FakeBot())
+    scheduler_utils.RECOVERY_DM_RATE = 10**9
+    scheduler_utils.RECOVERY_DM_BURST = 10**9
+    
+    started = time.perf_counter()
+    await scheduler_utils.process_missed_reminders(now)
+    elapsed = time.perf_counter() - started
+    
+    result = harness.summarize("missed_recovery", size, [elapsed], elapsed)
+    result["ops_per_sec"] = size / elapsed if elapsed else 0.0
+    return result
+
+async def run(args):
+    plan = [
+        (bench_on_message, args.commands),
+        (bench_vote, args.voters),
+        (bench_show_results, args.voters),
+        (bench_create_reminder, args.reminders),
+        (bench_missed_recovery, args.reminders)
+    ]
+    
+    results = []
+    for bench, sizes in plan:
+        for size in sizes:
+            result = await bench(size, args.iterations)
+            results.append(result)
+            print(f"{result['name']} size={size}: {result['ops_per_sec']:.1f} ops/s")
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths")
+    parser.add_argument("--mongo-uri", default="mongomock://localhost", help="mongomock://... or a local mongod URI")
+    parser.add_argument("--commands", type=_parse_sizes, default=[10, 1000, 100000], help="custom command counts")
+    parser.add_argument("--voters", type=_parse_sizes, default=[10, 1000, 50000], help="existing voters per poll")
+    parser.add_argument("--reminders", type=_parse_sizes, default=[100, 10000], help="stored reminder counts")
+    parser.add_argument("--iterations", type=int, default=500, help="calls measured per benchmark")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+    
+    harness.setup_environment(args.mongo_uri)
+    harness.quiet_logging()
+    results = asyncio.run(run(args))
+    
+    path = harness.save_results(results, args.out, mongo_uri=args.mongo_uri.split("@")[-1], iterations=args.iterations)
+    harness.print_results(results, args.compare)
+    print(f"\nSaved results to {path}")
+
+if __name__ == "__main__":
+    main()
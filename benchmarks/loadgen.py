@@ -0,0 +1,358 @@
+"""
+Traffic replay load generator for end-to-end capacity testing
+
+Replays synthetic or recorded interaction traces through the real cogs
+and bot.on_message, against a fake Discord API that simulates latency
+and 429 rate limits, and a Mongo stand-in. Each trace is replayed at
+increasing speeds to find the point where the process saturates.
+
+Trace files are JSON lines: {"t": <seconds from start>, "type": <event>, "user": <int>,
+"guild": <int>, "channel": <int>} with event types from EVENT_TYPES. guild and
+channel index the simulated guild and channel pools; when missing they are
+derived from the user.
+
+Usage:
+    python -m benchmarks.loadgen --duration 30 --rate 50 --stages 1,2,4,8
+    python -m benchmarks.loadgen --trace peak.jsonl --stages 1,4,16
+    python -m benchmarks.loadgen --write-trace peak.jsonl --duration 60 --rate 100
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from benchmarks import harness, fakes
+from benchmarks.fakes import FakeBot, FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeUser
+
+# Share of each event type in synthetic traces
+DEFAULT_MIX = {
+    "message": 0.45,
+    "vote": 0.33,
+    "results": 0.05,
+    "reminder_fire": 0.07,
+    "setreminder": 0.05,
+    "createpoll": 0.03,
+    "set_custom_command": 0.02
+}
+EVENT_TYPES = tuple(DEFAULT_MIX)
+
+# (requests, per seconds) per route and resource, loosely following Discord's limits
+ROUTE_LIMITS = {
+    "channel.send": (5, 5),
+    "message.edit": (5, 5),
+    "message.delete": (5, 1),
+    "message.fetch": (50, 1),
+    "dm.create": (10, 10),
+    "user.fetch": (50, 1)
+}
+# Interaction responses are exempt from the global limit
+GLOBAL_LIMIT = (50, 1)
+
+USER_POOL = 5000
+# Traffic is spread over this many guilds and channels, like a bot serving many servers.
+# Discord limits sends per channel, so a single channel would only measure its bucket
+GUILD_POOL = 50
+CHANNELS_PER_GUILD = 4
+SEED_POLLS = 20
+SEED_COMMANDS = 200
+
+class FakeDiscordHTTP:
+    """Simulated Discord REST API with latency, rate limit buckets and 429 retries"""
+    def __init__(self, latency_ms=80, jitter_ms=30, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.requests = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._windows = {}  # bucket key -> (window start, requests used)
+    
+    def _take(self, key, limit, now):
+        """Use one request from a bucket. Returns seconds to wait if it is exhausted"""
+        count, per = limit
+        start, used = self._windows.get(key, (now, 0))
+        if now - start >= per:
+            start, used = now, 0
+        
+        if used >= count:
+            return start + per - now
+        
+        self._windows[key] = (start, used + 1)
+        return 0
+    
+    async def request(self, route, resource_id=None):
+        while True:
+            now = time.monotonic()
+            retry_after = 0
+            if not route.startswith("interaction."):
+                retry_after = self._take(("global",), GLOBAL_LIMIT, now)
+            if not retry_after and route in ROUTE_LIMITS:
+                retry_after = self._take((route, resource_id), ROUTE_LIMITS[route], now)
+            
+            await asyncio.sleep(max(0.0, self._rng.gauss(self.latency, self.jitter)))
+            self.requests += 1
+            if not retry_after:
+                return
+            
+            # 429: wait out the bucket and retry, as discord.py's HTTP client does
+            self.rate_limited += 1
+            await asyncio.sleep(retry_after)
+
+def synthetic_trace(duration, rate, mix=DEFAULT_MIX, seed=None, guilds=GUILD_POOL, channels=CHANNELS_PER_GUILD):
+    """Poisson arrivals at `rate` events per second with the given event mix, spread uniformly over guilds and channels"""
+    rng = random.Random(seed)
+    types, weights = zip(*mix.items())
+    events = []
+    t = 0.0
+    
+    while True:
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return events
+        events.append({
+            "t": round(t, 4),
+            "type": rng.choices(types, weights)[0],
+            "user": rng.randrange(1, USER_POOL + 1),
+            "guild": rng.randrange(guilds),
+            "channel": rng.randrange(channels)
+        })
+
+def load_trace(path):
+    with open(path) as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    
+    unknown = {e["type"] for e in events} - set(EVENT_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown event types in trace: {', '.join(sorted(unknown))}")
+    
+    return sorted(events, key=lambda e: e["t"])
+
+class Replayer:
+    """Owns the bot components under test and dispatches trace events to them"""
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.polls = []  # (PollView, poll message)
+        self.fire_lag = []
+        self.fire_jobs = set()  # job IDs of reminder_fire events not yet delivered
+    
+    async def setup(self, guilds=GUILD_POOL, channels_per_guild=CHANNELS_PER_GUILD):
+        import db
+        import bot as bot_module
+        from cogs.polls import PollsCog
+        from cogs.reminders import RemindersCog
+        from cogs.custom_commands import CustomCommandsCog
+        from utils import scheduler_utils
+        from utils.reminder_engine import ReminderEngine
+        from config import REMINDER_MAX_CONCURRENT_DELIVERIES, SCHEDULER_MISFIRE_GRACE_TIME
+        
+        harness.reset_database()
+        self.db = db
+        self.on_message = bot_module.on_message
+        self.bot = FakeBot()
+        self.guilds = [FakeGuild() for _ in range(guilds)]
+        self.channels = [[FakeChannel(guild=guild) for _ in range(channels_per_guild)] for guild in self.guilds]
+        scheduler_utils.set_bot_instance(self.bot)
+        
+        async def deliver(job):
+            self.fire_lag.append(time.time() - job.run_at)
+            await scheduler_utils.deliver_reminder(job)
+        
+        self.bot.scheduler = ReminderEngine(
+            deliver,
+            max_concurrency=REMINDER_MAX_CONCURRENT_DELIVERIES,
+            misfire_grace_time=SCHEDULER_MISFIRE_GRACE_TIME
+        )
+        await self.bot.scheduler.start()
+        
+        self.polls_cog = PollsCog(self.bot)
+        self.reminders_cog = RemindersCog(self.bot)
+        self.commands_cog = CustomCommandsCog(self.bot)
+        
+        db.dbmanager.commands_collection.insert_many(
+            [{"guild_id": guild.id, "command_name": f"cmd{i}", "message": f"reply {i}"} for guild in self.guilds for i in range(SEED_COMMANDS)]
+        )
+        db.custom_commands_ops.load_command_registry()
+        db.dbmanager.timezones_collection.insert_many(
+            [{"userId": user_id, "timezone": "UTC"} for user_id in range(1, USER_POOL + 1)]
+        )
+        
+        for i in range(SEED_POLLS):
+            channels = self.channels[i % guilds]
+            await self.create_poll(FakeUser(), channels[i // guilds % channels_per_guild])
+    
+    def place(self, event):
+        """The channel an event happens in"""
+        user_id = event.get("user", 1)
+        channels = self.channels[event.get("guild", user_id) % len(self.channels)]
+        return channels[event.get("channel", user_id) % len(channels)]
+    
+    def interaction(self, user_id, channel, **kwargs):
+        return FakeInteraction(user=FakeUser(user_id), guild=channel.guild, channel=channel, **kwargs)
+    
+    async def create_poll(self, user, channel):
+        interaction = FakeInteraction(user=user, guild=channel.guild, channel=channel)
+        await self.polls_cog.createpoll.callback(self.polls_cog, interaction, "Load test poll", "Red, Green, Blue, Yellow")
+        if interaction.response.view is not None:
+            self.polls.append((interaction.response.view, await interaction.original_response()))
+    
+    async def handle(self, event):
+        kind = event["type"]
+        user_id = event.get("user", 1)
+        channel = self.place(event)
+        
+        if kind == "message":
+            await self.on_message(FakeMessage(f"!cmd{self.rng.randrange(SEED_COMMANDS)}", channel=channel, author=FakeUser(user_id), guild=channel.guild))
+        elif kind == "vote":
+            # Votes happen where the poll was posted
+            view, message = self.rng.choice(self.polls)
+            button = self.rng.choice(view.children[:-1])
+            await button.callback(self.interaction(user_id, message.channel, message=message))
+        elif kind == "results":
+            view, message = self.rng.choice(self.polls)
+            await view.children[-1].callback(self.interaction(user_id, message.channel))
+        elif kind == "createpoll":
+            await self.create_poll(FakeUser(user_id), channel)
+        elif kind == "setreminder":
+            date = (datetime.utcnow() + timedelta(days=1)).strftime("%d-%m-%Y")
+            await self.reminders_cog.setreminder.callback(self.reminders_cog, self.interaction(user_id, channel), "Load test", "reminder", date, "12:00")
+        elif kind == "set_custom_command":
+            name = f"load{time.perf_counter_ns()}"
+            await self.commands_cog.set_custom_command.callback(self.commands_cog, self.interaction(user_id, channel), name, "load test reply")
+        elif kind == "reminder_fire":
+            # A reminder due right now, its delivery lag is tracked separately
+            run_at = time.time()
+            job_id = await self.db.aio.reminder_ops.create_reminder(user_id, "Load test", "reminder", int(run_at))
+            self.bot.scheduler.add_job(run_at, user_id, "Load test", "reminder", job_id=job_id)
+            self.fire_jobs.add(job_id)
+    
+    async def run_stage(self, trace, speed, transport):
+        """Replay the trace open-loop at `speed` times its recorded pace"""
+        latencies = defaultdict(list)
+        errors = Counter()
+        self.fire_lag = []
+        requests_before, limited_before = transport.requests, transport.rate_limited
+        
+        async def timed(event):
+            t0 = time.perf_counter()
+            try:
+                await self.handle(event)
+            except Exception as e:
+                errors[f"{event['type']}: {type(e).__name__}"] += 1
+            latencies[event["type"]].append(time.perf_counter() - t0)
+        
+        tasks = []
+        started = time.perf_counter()
+        for event in trace:
+            delay = event["t"] / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(timed(event)))
+        
+        await asyncio.gather(*tasks)
+        # Let reminders fired during the stage finish delivering. Only reminder_fire
+        # jobs are waited on, setreminder jobs are due tomorrow
+        scheduler = self.bot.scheduler
+        while True:
+            self.fire_jobs = {job_id for job_id in self.fire_jobs if scheduler.get_job(job_id)}
+            if not self.fire_jobs and not scheduler.inflight:
+                break
+            await asyncio.sleep(0.05)
+        wall = time.perf_counter() - started
+        
+        span = (trace[-1]["t"] / speed) if trace else 0
+        all_samples = [s for samples in latencies.values() for s in samples]
+        result = {
+            "speed": speed,
+            "events": len(trace),
+            "offered_per_sec": len(trace) / span if span else 0.0,
+            "achieved_per_sec": len(trace) / wall if wall else 0.0,
+            "p50_ms": harness.percentile(all_samples, 50) * 1000 if all_samples else 0.0,
+            "p99_ms": harness.percentile(all_samples, 99) * 1000 if all_samples else 0.0,
+            "http_requests": transport.requests - requests_before,
+            "http_429s": transport.rate_limited - limited_before,
+            "errors": dict(errors),
+            "by_type": {
+                kind: harness.summarize(kind, len(samples), samples, wall)
+                for kind, samples in latencies.items()
+            }
+        }
+        if self.fire_lag:
+            result["reminder_fire_lag_p50_ms"] = harness.percentile(self.fire_lag, 50) * 1000
+            result["reminder_fire_lag_p99_ms"] = harness.percentile(self.fire_lag, 99) * 1000
+        
+        return result
+
+def find_saturation(stages, slo_ms):
+    """First stage that falls behind its offered load or breaks the p99 target"""
+    for stage in stages:
+        if stage["achieved_per_sec"] < 0.9 * stage["offered_per_sec"] or stage["p99_ms"] > slo_ms:
+            return stage["speed"]
+    return None
+
+def print_report(stages, saturation):
+    print(f"{'speed':>6}{'offered/s':>11}{'achieved/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'429s':>7}{'errors':>8}")
+    for s in stages:
+        print(f"{s['speed']:>6}{s['offered_per_sec']:>11.1f}{s['achieved_per_sec']:>12.1f}{s['p50_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['http_429s']:>7}{sum(s['errors'].values()):>8}")
+    
+    if saturation is None:
+        print("\nNo saturation point reached, try higher --stages")
+    else:
+        print(f"\nSaturated at {saturation}x ({next(s for s in stages if s['speed'] == saturation)['offered_per_sec']:.1f} events/s offered)")
+
+async def run(args, trace):
+    from ui.PollRenderer import render_scheduler
+    
+    transport = FakeDiscordHTTP(args.latency_ms, args.jitter_ms, seed=args.seed)
+    fakes.transport = transport
+    
+    replayer = Replayer(seed=args.seed)
+    await replayer.setup(args.guilds, args.channels_per_guild)
+    
+    stages = []
+    for speed in args.stages:
+        stage = await replayer.run_stage(trace, speed, transport)
+        stages.append(stage)
+        print(f"stage {speed}x: {stage['achieved_per_sec']:.1f}/s achieved, p99 {stage['p99_ms']:.1f} ms")
+    
+    await replayer.bot.scheduler.shutdown()
+    return stages, render_scheduler.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay interaction traces through the bot to find its capacity")
+    parser.add_argument("--trace", help="JSON lines trace to replay (default: synthetic)")
+    parser.add_argument("--write-trace", help="write the synthetic trace to this file and exit")
+    parser.add_argument("--duration", type=float, default=20, help="synthetic trace length in seconds")
+    parser.add_argument("--rate", type=float, default=25, help="synthetic events per second at 1x")
+    parser.add_argument("--stages", type=lambda v: [float(s) for s in v.split(",")], default=[1, 2, 4, 8], help="replay speed multipliers")
+    parser.add_argument("--guilds", type=int, default=GUILD_POOL, help="simulated guilds traffic is spread over")
+    parser.add_argument("--channels-per-guild", type=int, default=CHANNELS_PER_GUILD, help="simulated channels per guild")
+    parser.add_argument("--latency-ms", type=float, default=80, help="simulated Discord API latency")
+    parser.add_argument("--jitter-ms", type=float, default=30, help="simulated latency standard deviation")
+    parser.add_argument("--slo-ms", type=float, default=500, help="p99 latency above which a stage counts as saturated")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mongo-uri", default="mongomock://localhost")
+    parser.add_argument("--out", help="report file (default: benchmarks/results/loadgen-<commit>.json)")
+    args = parser.parse_args()
+    
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.duration, args.rate, seed=args.seed, guilds=args.guilds, channels=args.channels_per_guild)
+    if args.write_trace:
+        with open(args.write_trace, "w") as f:
+            f.writelines(json.dumps(event) + "\n" for event in trace)
+        print(f"Wrote {len(trace)} events to {args.write_trace}")
+        return
+    
+    harness.setup_environment(args.mongo_uri)
+    harness.quiet_logging()
+    stages, render_stats = asyncio.run(run(args, trace))
+    
+    saturation = find_saturation(stages, args.slo_ms)
+    print_report(stages, saturation)
+    
+    path = args.out or f"{harness.RESULTS_DIR}/loadgen-{harness.current_commit()}.json"
+    harness.save_results(stages, path, saturation_speed=saturation, slo_ms=args.slo_ms,
+                         latency_ms=args.latency_ms, render=render_stats, trace=args.trace or "synthetic")
+    print(f"Saved report to {path}")
+
+if __name__ == "__main__":
+    main()
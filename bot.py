@@ -1,8 +1,9 @@
 import discord
 import db
-from utils import timezones
-from utils.bot_utils import setup_logging, create_bot, initialize_bot_components
-from config import BOT_TOKEN, GUILD_ID
+from utils import timezones, metrics
+from utils.bot_utils import setup_logging, create_bot
+from utils.guilds import COMMAND_GUILDS
+from config import BOT_TOKEN
 
 # Configure logging
 setup_logging()
@@ -15,19 +16,14 @@ TzMenuOptions = []
 for x in timezones.timezones_list:
     TzMenuOptions.append(discord.SelectOption(label=x, value=x))
 
-@bot.event
-async def on_ready():
-    """Initialize bot components when ready"""
-    await initialize_bot_components(bot)
-
-@bot.tree.command(name="settimezone", description="Set a timezone for your reminders", guild=discord.Object(GUILD_ID))
+@bot.tree.command(name="settimezone", description="Set a timezone for your reminders", guilds=COMMAND_GUILDS)
 async def settimezone(interaction: discord.Interaction):
     dropdownMenu = discord.ui.Select(options=TzMenuOptions)
     
     async def buttonCallback(callbackinteraction: discord.Interaction):
         chosen = callbackinteraction.data['values'][0]
         await callbackinteraction.response.send_message("Timezone added!")
-        db.user_ops.create_tz_doc(interaction.user.id, chosen)
+        await db.aio.user_ops.create_tz_doc(interaction.user.id, chosen)
         
     dropdownMenu.callback = buttonCallback
     
@@ -37,13 +33,24 @@ async def settimezone(interaction: discord.Interaction):
 
 @bot.event
 async def on_message(message: discord.Message):
-    if message.content.startswith("!"):
-        main_command = message.content.removeprefix("!")
-        existing_names = db.custom_commands_ops.get_existing_command_names()
+    if message.guild is None:
+        return
+    
+    settings = db.guild_ops.cached_guild_settings(message.guild.id)
+    if settings is None:
+        settings = await db.aio.guild_ops.get_guild_settings(message.guild.id)
+    
+    prefix = settings["prefix"]
+    if message.content.startswith(prefix):
+        main_command = message.content.removeprefix(prefix)
+        reply = db.custom_commands_ops.resolve_command(message.guild.id, main_command)
         
-        if main_command in existing_names:
-            reply = db.custom_commands_ops.get_reply(main_command)
+        if reply is not None:
+            metrics.custom_commands_total.inc(result="hit")
             await message.channel.send(reply, reference=message)
+        else:
+            metrics.custom_commands_total.inc(result="miss")
 
 if __name__ == "__main__":
-    bot.run(BOT_TOKEN)
+    # Logging is already routed through the queue pipeline, skip discord.py's default handler
+    bot.run(BOT_TOKEN, log_handler=None)
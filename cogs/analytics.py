@@ -0,0 +1,98 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import db
+import logging
+from config import ANALYTICS_MAX_DAYS
+from utils.guilds import COMMAND_GUILDS
+
+# Set up logger for this cog
+logger = logging.getLogger(__name__)
+
+class AnalyticsCog(commands.Cog):
+    """Poll statistics computed by MongoDB aggregation pipelines, only summaries leave the database"""
+    pollstats = app_commands.Group(name="pollstats", description="Poll statistics for this server", guild_only=True)
+    
+    def __init__(self, bot : commands.Bot):
+        self.bot = bot
+        logger.info("AnalyticsCog initialized")
+    
+    @pollstats.command(name="overview", description="Votes, voters, daily activity and the busiest polls")
+    @app_commands.describe(days="How many days back to look")
+    async def overview(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, ANALYTICS_MAX_DAYS] = 30):
+        try:
+            stats = await db.aio.analytics_ops.vote_overview(interaction.guild_id, days)
+            
+            embed = discord.Embed(
+                title=f"📈 Poll activity, last {days} days",
+                description=f"**{stats['votes']}** votes from **{stats['voters']}** voters",
+                color=discord.Color.blue()
+            )
+            
+            if stats["daily"]:
+                peak = max(votes for _, votes in stats["daily"])
+                lines = [
+                    f"`{day.strftime('%m-%d')}` {'█' * round(votes / peak * 10)} {votes}"
+                    for day, votes in stats["daily"][-14:]
+                ]
+                embed.add_field(name="Votes per day", value="\n".join(lines), inline=False)
+            
+            if stats["busiest"]:
+                lines = [f"{i+1}. {question[:80]} ({votes} votes)" for i, (question, votes) in enumerate(stats["busiest"])]
+                embed.add_field(name="Busiest polls", value="\n".join(lines), inline=False)
+            
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error computing poll overview for guild {interaction.guild_id}: {e}")
+            await interaction.response.send_message(f"Error computing poll stats: {e}", ephemeral=True)
+    
+    @pollstats.command(name="top_voters", description="The most active voters")
+    @app_commands.describe(days="How many days back to look")
+    async def top_voters(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, ANALYTICS_MAX_DAYS] = 30):
+        try:
+            voters = await db.aio.analytics_ops.top_voters(interaction.guild_id, days)
+            if not voters:
+                await interaction.response.send_message(f"No votes in the last {days} days.", ephemeral=True)
+                return
+            
+            lines = [f"{i+1}. <@{user_id}> ({votes} votes)" for i, (user_id, votes) in enumerate(voters)]
+            embed = discord.Embed(
+                title=f"🗳️ Top voters, last {days} days",
+                description="\n".join(lines),
+                color=discord.Color.blue()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error computing top voters for guild {interaction.guild_id}: {e}")
+            await interaction.response.send_message(f"Error computing poll stats: {e}", ephemeral=True)
+    
+    @pollstats.command(name="creator", description="Poll history of a member, open and closed")
+    @app_commands.describe(member="Member whose polls to show, yourself if empty")
+    async def creator(self, interaction: discord.Interaction, member: discord.Member = None):
+        member = member or interaction.user
+        try:
+            history = await db.aio.analytics_ops.creator_history(interaction.guild_id, member.id)
+            if not history["polls"]:
+                await interaction.response.send_message(f"{member.display_name} hasn't created any polls.", ephemeral=True)
+                return
+            
+            embed = discord.Embed(
+                title=f"📊 Polls by {member.display_name}",
+                description=f"**{history['polls']}** polls ({history['open']} open) with **{history['votes']}** votes in total",
+                color=discord.Color.blue()
+            )
+            lines = [
+                f"{'🟢' if is_open else '⚪'} {question[:80]} ({votes} votes)"
+                for question, votes, is_open in history["recent"]
+            ]
+            embed.add_field(name="Recent polls", value="\n".join(lines), inline=False)
+            
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error computing creator history for {member.id}: {e}")
+            await interaction.response.send_message(f"Error computing poll stats: {e}", ephemeral=True)
+
+async def setup(bot:commands.Bot):
+    
+    cog = AnalyticsCog(bot)
+    await bot.add_cog(cog, guilds=COMMAND_GUILDS)
@@ -1,71 +1,99 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import db
 import logging
-import dotenv
-import os
+from pymongo.errors import DuplicateKeyError
+from config import COMMAND_REGISTRY_POLL_INTERVAL, GUILD_ID
+from utils.guilds import COMMAND_GUILDS
+from ui.Paginator import Paginator
 
 # Set up logger for this cog
 logger = logging.getLogger(__name__)
 
-GUILD_ID = int(os.getenv("GUILD_ID"))
-
 class CustomCommandsCog(commands.Cog):
     def __init__(self, bot : commands.Bot):
         self.bot = bot
         logger.info("CustomCommandsCog initialized")
+    
+    async def cog_load(self):
+        if GUILD_ID:
+            # Commands created by the single-guild version of the bot belong to GUILD_ID
+            await db.aio.custom_commands_ops.backfill_guild_id(GUILD_ID)
+        await db.aio.custom_commands_ops.load_command_registry()
+        self.refresh_registry.start()
+    
+    async def cog_unload(self):
+        self.refresh_registry.cancel()
+    
+    @tasks.loop(seconds=COMMAND_REGISTRY_POLL_INTERVAL)
+    async def refresh_registry(self):
+        """Pick up commands added or removed by other processes"""
+        try:
+            reloaded = await db.aio.custom_commands_ops.refresh_command_registry()
+            if reloaded:
+                logger.info(f"Reloaded custom commands of {reloaded} guilds after version change")
+        except Exception as e:
+            logger.error(f"Failed to refresh custom command registry: {e}")
         
     @app_commands.command(name="set_custom_command", description="set a custom command that replies with a predefined message")
     @app_commands.describe(command_name="name of the command", message="message that the command will reply with")
+    @app_commands.guild_only()
     async def set_custom_command(self, interaction: discord.Interaction, command_name:str, message:str):
-        existing_names = db.custom_commands_ops.get_existing_command_names()
-        
-        if command_name in existing_names:
+        if db.custom_commands_ops.command_exists(interaction.guild_id, command_name):
             await interaction.response.send_message(":red_circle: Command with that name already exists", ephemeral=True)
         else:
-            db.custom_commands_ops.add_command_doc(command_name, message)
+            try:
+                await db.aio.custom_commands_ops.add_command_doc(interaction.guild_id, command_name, message)
+            except DuplicateKeyError:
+                # Another process added it since this process last refreshed its registry
+                await interaction.response.send_message(":red_circle: Command with that name already exists", ephemeral=True)
+                return
             await interaction.response.send_message(":green_circle: Command added successfully", ephemeral=True)
     
     @app_commands.command(name="remove_custom_command", description="remove an existing custom command")
     @app_commands.describe(command_name="name of the command")
+    @app_commands.guild_only()
     async def remove_custom_command(self, interaction: discord.Interaction, command_name:str):
-        existing_names = db.custom_commands_ops.get_existing_command_names()
-        
-        if command_name in existing_names:
-            db.custom_commands_ops.rem_custom_command(command_name=command_name)
+        if db.custom_commands_ops.command_exists(interaction.guild_id, command_name):
+            await db.aio.custom_commands_ops.rem_custom_command(interaction.guild_id, command_name=command_name)
             await interaction.response.send_message(":green_circle: Command successfully removed", ephemeral=True)
         else:
             await interaction.response.send_message(":red_circle: Command doesn't exist", ephemeral=True)
 
     @app_commands.command(name="list_custom_commands", description="list all existing custom commands")
+    @app_commands.guild_only()
     async def list_custom_commands(self, interaction: discord.Interaction):
         try:
-            message = "Here are all the custom commands:\n"
-            customcommands = db.custom_commands_ops.get_all_commands()
+            guild_id = interaction.guild_id
             
-            cmd_count = 0
-            for cmd in customcommands:
-                command = cmd["command_name"]
-                
-                message += f"\n- 💻 **{command}**\n"
-                cmd_count += 1
+            async def fetch_page(after, limit):
+                return await db.aio.custom_commands_ops.get_commands_page(guild_id, after, limit)
             
-            if cmd_count == 0:
-                message = "No custom commands were found."
-                
-            await interaction.response.send_message(message, ephemeral=True)
+            def format_page(customcommands, page):
+                message = f"Here are the custom commands (page {page}):\n"
+                for cmd in customcommands:
+                    command = cmd["command_name"]
+                    
+                    message += f"\n- 💻 **{command}**\n"
+                return message
+            
+            paginator = Paginator(fetch_page, lambda cmd: cmd["command_name"], format_page, interaction.user.id)
+            await paginator.send(interaction, "No custom commands were found.")
             
         except Exception as e:
             await interaction.response.send_message(f"Error listing custom commands: {e}", ephemeral=True)
 
+    @app_commands.command(name="set_command_prefix", description="set the prefix custom commands are triggered with in this server")
+    @app_commands.describe(prefix="prefix to trigger custom commands with, e.g. ! or ?")
+    @app_commands.guild_only()
+    @app_commands.default_permissions(manage_guild=True)
+    async def set_command_prefix(self, interaction: discord.Interaction, prefix: app_commands.Range[str, 1, 5]):
+        await db.aio.guild_ops.update_guild_settings(interaction.guild_id, prefix=prefix)
+        await interaction.response.send_message(f":green_circle: Custom commands now use the `{prefix}` prefix", ephemeral=True)
         
 
 async def setup(bot:commands.Bot):
     
     cog = CustomCommandsCog(bot)
-    await bot.add_cog(cog)
-    
-    bot.tree.add_command(cog.set_custom_command, guild=discord.Object(GUILD_ID))
-    bot.tree.add_command(cog.remove_custom_command, guild=discord.Object(GUILD_ID))
-    bot.tree.add_command(cog.list_custom_commands, guild=discord.Object(GUILD_ID))
\ No newline at end of file
+    await bot.add_cog(cog, guilds=COMMAND_GUILDS)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import asyncio
+import discord
+from discord import app_commands
+from discord.ext import commands
+import db
+import io
+import logging
+from db.vote_buffer import vote_buffer
+from ui.PollRenderer import poll_cache, render_scheduler
+from utils import dm_cache
+from utils.guilds import COMMAND_GUILDS
+from utils.profiler import SamplingProfiler
+from config import PROFILER_SAMPLE_INTERVAL, PROFILER_MAX_SECONDS
+
+# Set up logger for this cog
+logger = logging.getLogger(__name__)
+
+async def is_owner(interaction: discord.Interaction) -> bool:
+    return await interaction.client.is_owner(interaction.user)
+
+class ManagerCog(commands.Cog):
+    """Owner-only diagnostics: on-demand profiling and runtime stats"""
+    def __init__(self, bot : commands.Bot):
+        self.bot = bot
+        self.profiler = None
+        self.profile_task = None
+        logger.info("ManagerCog initialized")
+    
+    async def cog_unload(self):
+        if self.profile_task:
+            self.profile_task.cancel()
+    
+    async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.CheckFailure):
+            await interaction.response.send_message("This command is restricted to the bot owner.", ephemeral=True)
+        else:
+            logger.error(f"Manager command failed: {error}")
+    
+    @app_commands.command(name="profile", description="Profile the running bot for N seconds and attach the collapsed stacks")
+    @app_commands.describe(seconds="How long to sample for")
+    @app_commands.check(is_owner)
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, PROFILER_MAX_SECONDS]):
+        if self.profiler and self.profiler.running:
+            await interaction.response.send_message("A profile is already running. Use `/profile_stop` to end it.", ephemeral=True)
+            return
+        
+        self.profiler = SamplingProfiler(PROFILER_SAMPLE_INTERVAL)
+        self.profiler.start()
+        await interaction.response.send_message(f"Profiling for {seconds}s...", ephemeral=True)
+        logger.info(f"User {interaction.user.id} started a {seconds}s profile")
+        
+        self.profile_task = asyncio.create_task(self._finish_profile(interaction, seconds))
+    
+    @app_commands.command(name="profile_stop", description="Stop the running profile early and attach what was captured")
+    @app_commands.check(is_owner)
+    async def profile_stop(self, interaction: discord.Interaction):
+        if not self.profile_task or self.profile_task.done():
+            await interaction.response.send_message("No profile is running.", ephemeral=True)
+            return
+        
+        self.profile_task.cancel()
+        await interaction.response.send_message("Stopping profiler, the results will follow.", ephemeral=True)
+    
+    async def _finish_profile(self, interaction: discord.Interaction, seconds):
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            pass
+        
+        profiler = self.profiler
+        await asyncio.to_thread(profiler.stop)
+        elapsed = profiler.stopped_at - profiler.started_at
+        
+        try:
+            data = profiler.collapsed().encode("utf-8")
+            await interaction.followup.send(
+                f"Profile finished: {profiler.sample_count} samples over {elapsed:.1f}s. "
+                "Open with speedscope or flamegraph.pl.",
+                file=discord.File(io.BytesIO(data), filename="profile.collapsed.txt"),
+                ephemeral=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to send profile results: {e}")
+    
+    @app_commands.command(name="botstats", description="Show task counts, cache sizes and scheduler queue depth")
+    @app_commands.check(is_owner)
+    async def botstats(self, interaction: discord.Interaction):
+        lines = [f"asyncio tasks: {len(asyncio.all_tasks())}"]
+        
+        scheduler = getattr(self.bot, 'scheduler', None)
+        if scheduler:
+            lines.append(f"scheduler: {scheduler.queue_depth} queued, {scheduler.inflight} in flight, {scheduler.fired} fired, {scheduler.misfired} misfired")
+        
+        lines.append(f"custom command registry: {db.custom_commands_ops.registry_size()} commands")
+        lines.append(f"timezone cache: {db.user_ops.tz_cache_stats()}")
+        lines.append(f"guild settings cache: {db.guild_ops.settings_cache_stats()}")
+        lines.append(f"dm channel cache: {dm_cache.stats()}")
+        lines.append(f"poll renders: {render_scheduler.stats()}")
+        lines.append(f"poll cache: {poll_cache.stats()}")
+        lines.append(f"analytics cache: {db.analytics_ops.cache_stats()}")
+        lines.append(f"vote buffer: {len(vote_buffer)} pending votes")
+        
+        watchdog = getattr(self.bot, 'watchdog', None)
+        if watchdog:
+            lines.append(f"loop watchdog: {watchdog.stalls} stalls, max lag {watchdog.max_lag * 1000:.0f}ms")
+        
+        await interaction.response.send_message("```\n" + "\n".join(lines) + "\n```", ephemeral=True)
+
+async def setup(bot:commands.Bot):
+    
+    cog = ManagerCog(bot)
+    await bot.add_cog(cog, guilds=COMMAND_GUILDS)
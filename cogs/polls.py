@@ -1,33 +1,143 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
-from ui.PollButton import PollButton
+from ui.PollButton import PollButton, PollResultsButton
 from ui.PollView import PollView
+from ui.Paginator import Paginator
+from ui.PollRenderer import poll_cache, render_scheduler, poll_description, build_results_embed
+from db.vote_buffer import vote_buffer
+from bson.objectid import ObjectId
 from datetime import datetime
+import asyncio
 import db
-import os
 import logging
+import time
+from config import GUILD_ID, POLL_MAX_DURATION_MINUTES, POLL_EXPIRY_SWEEP_INTERVAL, POLL_VOTE_BUFFERING, POLL_RELINK_LEASE, POLL_RELINK_ATTEMPTS
+from utils.guilds import COMMAND_GUILDS
 
 # Set up logger for this cog
 logger = logging.getLogger(__name__)
 
-# Get GUILD_ID from environment
-GUILD_ID = int(os.getenv("GUILD_ID"))
-
 class PollsCog(commands.Cog):
     def __init__(self, bot : commands.Bot):
         self.bot = bot
+        self.relink_task = None
         logger.info("PollsCog initialized")
+    
+    async def cog_load(self):
+        # Polls created before poll_votes existed keep voters inside the poll document
+        await db.aio.polls_ops.migrate_legacy_votes()
+        if GUILD_ID:
+            # Polls created by the single-guild version of the bot belong to GUILD_ID
+            await db.aio.polls_ops.backfill_guild_id(GUILD_ID)
+        await db.aio.polls_ops.backfill_vote_guild_ids()
         
+        self.relink_task = asyncio.create_task(self.relink_legacy_polls())
+        self.expire_polls.start()
+    
+    async def cog_unload(self):
+        if self.relink_task:
+            self.relink_task.cancel()
+        self.expire_polls.cancel()
     
+    @tasks.loop(seconds=POLL_EXPIRY_SWEEP_INTERVAL)
+    async def expire_polls(self):
+        """Archive polls whose duration ran out and freeze their messages on the final results"""
+        try:
+            poll_ids = await db.aio.polls_ops.get_expired_poll_ids(time.time())
+            if not poll_ids:
+                return
+            
+            if POLL_VOTE_BUFFERING:
+                # Votes cast before the deadline still count
+                await vote_buffer.flush()
+            
+            archived = 0
+            for poll_id in poll_ids:
+                try:
+                    archive = await db.aio.polls_ops.archive_poll(poll_id, reason="expired")
+                except Exception as e:
+                    # The poll keeps its closing mark, a later sweep retries it once the lease lapses
+                    logger.error(f"Failed to archive expired poll {poll_id}: {e}")
+                    continue
+                
+                if archive is None:
+                    # Closed by hand or being archived by another process
+                    continue
+                
+                poll_cache.discard(poll_id)
+                await self.freeze_poll_message(archive)
+                archived += 1
+            
+            if archived:
+                logger.info(f"Archived {archived} expired polls")
+        except Exception as e:
+            logger.error(f"Failed to expire polls: {e}")
+    
+    async def freeze_poll_message(self, archive):
+        """Replace a closed poll's buttons with its final results"""
+        try:
+            # A vote or flush just before the deadline may still have a live re-render queued
+            render_scheduler.discard(int(archive["poll_msg_id"]))
+            message = self.bot.get_partial_messageable(archive["channel_id"]).get_partial_message(int(archive["poll_msg_id"]))
+            await message.edit(embed=build_results_embed(archive, description="This poll has ended."), view=None)
+        except discord.NotFound:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to update message of expired poll {archive['_id']}: {e}")
+    
+    async def relink_legacy_polls(self):
+        """Swap the random-id buttons of polls created before persistent views for persistent ones"""
+        relinked = 0
+        for _ in range(POLL_RELINK_ATTEMPTS):
+            failed = 0
+            while True:
+                try:
+                    poll = await db.aio.polls_ops.claim_legacy_poll(time.time(), POLL_RELINK_LEASE)
+                except Exception as e:
+                    logger.error(f"Failed to claim legacy poll for relinking: {e}")
+                    return
+                
+                if poll is None:
+                    break
+                
+                try:
+                    message = self.bot.get_partial_messageable(poll["channel_id"]).get_partial_message(int(poll["poll_msg_id"]))
+                    await message.edit(view=PollView(str(poll["_id"]), poll["options"]))
+                    relinked += 1
+                except discord.NotFound:
+                    # The message is gone, there are no buttons left to relink
+                    pass
+                except Exception as e:
+                    # The lease stays, so the poll is retried once it expires
+                    failed += 1
+                    logger.error(f"Failed to relink legacy poll {poll['_id']}: {e}")
+                    continue
+                
+                try:
+                    await db.aio.polls_ops.mark_poll_relinked(poll["_id"])
+                except Exception as e:
+                    logger.error(f"Failed to mark legacy poll {poll['_id']} as relinked: {e}")
+            
+            if not failed:
+                break
+            
+            logger.warning(f"Relinking {failed} legacy polls failed, retrying in {POLL_RELINK_LEASE}s")
+            await asyncio.sleep(POLL_RELINK_LEASE)
+        
+        if relinked:
+            logger.info(f"Relinked buttons of {relinked} polls created before persistent views")
         
+
     # Poll system
     @app_commands.command(name="createpoll", description="Create a poll with multiple options")
     @app_commands.describe(
         question="The poll question",
-        options="Poll options separated by commas (e.g., Option1, Option2, Option3)"
+        options="Poll options separated by commas (e.g., Option1, Option2, Option3)",
+        duration="Minutes until the poll closes on its own, leave empty to keep it open until /closepoll"
     )
-    async def createpoll(self, interaction: discord.Interaction, question: str, options: str):
+    @app_commands.guild_only()
+    async def createpoll(self, interaction: discord.Interaction, question: str, options: str, duration: app_commands.Range[int, 1, POLL_MAX_DURATION_MINUTES] = None):
         try:
             # Parse options
             option_list = [opt.strip() for opt in options.split(',') if opt.strip()]
@@ -40,10 +150,12 @@ class PollsCog(commands.Cog):
                 await interaction.response.send_message("Maximum 10 options allowed.", ephemeral=True)
                 return
             
+            expires_at = time.time() + duration * 60 if duration else None
+            
             # Create poll embed
             embed = discord.Embed(
                 title=f"📊 {question}",
-                description="Click the buttons below to vote!",
+                description=poll_description(expires_at),
                 color=discord.Color.blue()
             )
             
@@ -57,8 +169,9 @@ class PollsCog(commands.Cog):
             
             embed.set_footer(text=f"Poll created using Theseus Bot")
             
-            # Create buttons for voting
-            view = PollView(option_list, question, interaction.user.id)
+            # The id is generated up front so the buttons can carry it in their custom_ids
+            poll_oid = ObjectId()
+            view = PollView(str(poll_oid), option_list)
             
             await interaction.response.send_message(embed=embed, view=view)
             
@@ -68,17 +181,23 @@ class PollsCog(commands.Cog):
             
             # Store poll in database
             poll_data = {
+                "_id": poll_oid,
+                "guild_id": interaction.guild_id,
                 "question": question,
                 "options": option_list,
-                "votes": {str(i): [] for i in range(len(option_list))},  # Store user IDs who voted for each option
+                "counts": {str(i): 0 for i in range(len(option_list))},  # Per-option vote counters, voters live in poll_votes
+                "total_votes": 0,
                 "poll_msg_id": str(poll_msg_id),
                 "creator_id": interaction.user.id,
                 "channel_id": interaction.channel.id,
                 "created_at": datetime.now().isoformat()
             }
+            if expires_at:
+                poll_data["expires_at"] = expires_at
             
-            result = db.dbmanager.polls_collection.insert_one(poll_data)
-            view.poll_id = str(result.inserted_id)
+            await db.aio.polls_ops.create_poll_doc(poll_data)
+            # The first Show Results click is served from memory
+            poll_cache.update(poll_data)
             
             logger.info(f"Poll created by {interaction.user.global_name} (ID: {interaction.user.id}): '{question}'")
             
@@ -87,31 +206,32 @@ class PollsCog(commands.Cog):
             await interaction.response.send_message(f"Error creating poll: {e}", ephemeral=True)
             
     @app_commands.command(name="listpolls", description="lists all active polls")
+    @app_commands.guild_only()
     async def listpolls(self, interaction: discord.Interaction):
         try:
-            message = "Here are all the active polls:\n"
-            stored_polls = db.polls_ops.get_all_polls()
-            
-            poll_count = 0
-            for poll in stored_polls:
-                poll_object_id = str(poll["_id"])  # MongoDB ObjectId
-                poll_msg_id = poll.get("poll_msg_id", "N/A")  # Discord message ID
-                poll_title = poll["question"]
-                
-                # Count total votes
-                total_votes = sum(len(voters) for voters in poll.get("votes", {}).values())
-                
-                message += f"\n📊 **{poll_title}**\n"
-                message += f"   Poll Object ID: `{poll_object_id}`\n"
-                message += f"   Message ID: `{poll_msg_id}`\n"
-                message += f"   Total Votes: {total_votes}\n"
-                poll_count += 1
-            
-            if poll_count == 0:
-                message = "No active polls found."
-                
-            await interaction.response.send_message(message, ephemeral=True)
-            logger.info(f"User {interaction.user.global_name} listed polls ({poll_count} found)")
+            guild_id = interaction.guild_id
+            
+            async def fetch_page(after, limit):
+                return await db.aio.polls_ops.get_polls_page(guild_id, after, limit)
+            
+            def format_page(polls, page):
+                message = f"Here are the active polls (page {page}):\n"
+                for poll in polls:
+                    poll_object_id = str(poll["_id"])  # MongoDB ObjectId
+                    poll_msg_id = poll.get("poll_msg_id", "N/A")  # Discord message ID
+                    poll_title = poll["question"][:100]
+                    
+                    total_votes = poll.get("total_votes", 0)
+                    
+                    message += f"\n📊 **{poll_title}**\n"
+                    message += f"   Poll Object ID: `{poll_object_id}`\n"
+                    message += f"   Message ID: `{poll_msg_id}`\n"
+                    message += f"   Total Votes: {total_votes}\n"
+                return message
+            
+            paginator = Paginator(fetch_page, lambda poll: poll["_id"], format_page, interaction.user.id)
+            await paginator.send(interaction, "No active polls found.")
+            logger.info(f"User {interaction.user.global_name} listed polls")
             
         except Exception as e:
             logger.error(f"Error listing polls for user {interaction.user.id}: {e}")
@@ -119,19 +239,20 @@ class PollsCog(commands.Cog):
 
     @app_commands.command(name="closepoll", description="close an already created poll")
     @app_commands.describe(poll_id="id of poll to close")
+    @app_commands.guild_only()
     async def closepoll(self, interaction: discord.Interaction, poll_id: str):
         try:
-            # Get poll data before deleting
-            poll_data = db.polls_ops.get_poll_by_id(poll_id)
+            if POLL_VOTE_BUFFERING:
+                # Votes cast before closing still count in the archive
+                await vote_buffer.flush()
+            
+            # Move the poll into the archive, polls of other guilds are never visible here
+            poll_data = await db.aio.polls_ops.archive_poll(poll_id, interaction.guild_id)
             if not poll_data:
                 await interaction.response.send_message(f"Poll `{poll_id}` not found.", ephemeral=True)
                 return
-            
-            # Delete from database
-            success = db.polls_ops.rem_poll_doc(poll_id)
-            if not success:
-                await interaction.response.send_message(f"Failed to delete poll `{poll_id}` from database.", ephemeral=True)
-                return
+            poll_cache.discard(str(poll_data["_id"]))
+            render_scheduler.discard(int(poll_data["poll_msg_id"]))
             
             # Try to delete the Discord message
             try:
@@ -141,11 +262,11 @@ class PollsCog(commands.Cog):
                     await poll_message.delete()
                     await interaction.response.send_message(f"Poll '{poll_data['question']}' has been closed and removed.", ephemeral=True)
                 else:
-                    await interaction.response.send_message(f"Poll '{poll_data['question']}' removed from database but couldn't find the channel.", ephemeral=True)
+                    await interaction.response.send_message(f"Poll '{poll_data['question']}' closed but couldn't find the channel.", ephemeral=True)
             except discord.NotFound:
-                await interaction.response.send_message(f"Poll '{poll_data['question']}' removed from database but message was already deleted.", ephemeral=True)
+                await interaction.response.send_message(f"Poll '{poll_data['question']}' closed but message was already deleted.", ephemeral=True)
             except Exception as msg_error:
-                await interaction.response.send_message(f"Poll '{poll_data['question']}' removed from database but couldn't delete message: {msg_error}", ephemeral=True)
+                await interaction.response.send_message(f"Poll '{poll_data['question']}' closed but couldn't delete message: {msg_error}", ephemeral=True)
                 
         except Exception as e:
             logger.error(f"Error closing poll {poll_id}: {e}")
@@ -155,8 +276,10 @@ class PollsCog(commands.Cog):
 async def setup(bot:commands.Bot):
     
     cog = PollsCog(bot)
-    await bot.add_cog(cog)
+    await bot.add_cog(cog, guilds=COMMAND_GUILDS)
     
-    bot.tree.add_command(cog.createpoll, guild=discord.Object(GUILD_ID))
-    bot.tree.add_command(cog.listpolls, guild=discord.Object(GUILD_ID))
-    bot.tree.add_command(cog.closepoll, guild= discord.Object(GUILD_ID))
+    # One handler per button kind serves every poll, however many are open
+    bot.add_dynamic_items(PollButton, PollResultsButton)
+
+async def teardown(bot:commands.Bot):
+    bot.remove_dynamic_items(PollButton, PollResultsButton)
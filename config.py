@@ -9,22 +9,110 @@ dotenv.load_dotenv()
 
 # Bot Configuration
 BOT_TOKEN = os.getenv("BOT_TOKEN")
-GUILD_ID = int(os.getenv("GUILD_ID")) if os.getenv("GUILD_ID") else None
-COMMAND_PREFIX = "!"
+GUILD_ID = int(os.getenv("GUILD_ID")) if os.getenv("GUILD_ID") else None  # legacy single-guild deployments, data without a guild is backfilled to it
+# Guilds that get slash commands registered directly, commands are global when empty
+GUILD_IDS = [int(guild_id) for guild_id in os.getenv("GUILD_IDS", "").split(",") if guild_id.strip()] or ([GUILD_ID] if GUILD_ID else [])
+COMMAND_PREFIX = "!"  # default custom command prefix, guilds can override it
+COMMAND_SYNC_FORCE = os.getenv("FORCE_COMMAND_SYNC") == "1"  # sync even when the command tree fingerprint is unchanged
+COMMAND_SYNC_CONCURRENCY = 5  # guilds whose command trees are synced at once
 
 # Scheduler Configuration
 SCHEDULER_MISFIRE_GRACE_TIME = 300  # 5 minutes
-SCHEDULER_MAX_INSTANCES = 1
-RATE_LIMIT_DELAY = 1  # seconds between batch operations
+SCHEDULER_COALESCE = True  # re-adding a pending job replaces it
+REMINDER_MAX_CONCURRENT_DELIVERIES = 50  # reminder DMs in flight at once
+REMINDER_LOOKAHEAD_WINDOW = 600  # only reminders due within this many seconds are kept in memory
+REMINDER_WINDOW_REFRESH_INTERVAL = 60  # seconds between window advances
+REMINDER_PAGE_SIZE = 500  # reminders fetched per query when the window advances
+REMINDER_PREWARM_LEAD = 60  # seconds before a reminder is due to resolve its DM channel
+
+# Cluster Configuration
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None  # total shards across all processes, None lets Discord decide
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()] or None  # shards this process runs, needs SHARD_COUNT. None runs all of them
+PROCESS_HEARTBEAT_INTERVAL = 10  # seconds between process heartbeats
+PROCESS_DEAD_AFTER = 30  # seconds without a heartbeat before a process' reminder claims are taken over
+PROCESS_RECORD_TTL = 86400  # seconds before records of stopped processes are removed
+REMINDER_CLAIM_LEASE = 120  # seconds a process may hold a reminder claim before another may take it
+
+# DM Channel Cache Configuration
+DM_CACHE_SIZE = 10000  # users whose DM channel is kept
+DM_CACHE_TTL = 3600  # seconds a cached DM channel stays valid
+
+# Missed Reminder Recovery Configuration
+RECOVERY_CONCURRENCY = 10  # missed reminders sent in parallel
+RECOVERY_DM_RATE = 5  # DMs per second allowed during recovery
+RECOVERY_DM_BURST = 5  # DMs that may be sent back to back
+RECOVERY_ACK_BATCH_SIZE = 100  # delivered reminders deleted per delete_many
+RECOVERY_PROGRESS_INTERVAL = 10  # seconds between progress log lines
+
+# Database Configuration
+DB_EXECUTOR_MAX_WORKERS = 8  # threads serving blocking pymongo calls
+TZ_CACHE_SIZE = 50000  # users whose timezone is kept in memory
+TZ_CACHE_TTL = 3600  # seconds before a cached timezone is re-read
+TZ_CACHE_NEGATIVE_TTL = 30  # seconds a user without a timezone is cached, so one set elsewhere shows up quickly
+TZ_VERSION_POLL_INTERVAL = 30  # seconds between checks for timezones changed by other processes
+GUILD_SETTINGS_CACHE_SIZE = 10000  # guilds whose settings are kept in memory
+GUILD_SETTINGS_CACHE_TTL = 3600  # seconds before cached guild settings are re-read
+
+# Custom Command Registry Configuration
+COMMAND_REGISTRY_POLL_INTERVAL = 30  # seconds between version counter checks
+
+# List View Configuration
+LIST_PAGE_SIZE = 10  # rows per page of /listpolls, /listreminders and /list_custom_commands
+
+# Poll Configuration
+POLL_RENDER_INTERVAL = 2.0  # minimum seconds between edits of one poll message
+POLL_CACHE_SIZE = 5000  # polls whose latest tally and rendered embeds are kept in memory
+POLL_CACHE_TTL = 3600  # seconds before a cached tally is re-read from the database
+POLL_VOTE_BUFFERING = False  # buffer votes in memory and write them in bulk
+POLL_VOTE_FLUSH_INTERVAL_MS = 500  # flush buffered votes at least this often
+POLL_VOTE_FLUSH_MAX_VOTES = 500  # flush early once this many votes are buffered
+POLL_MAX_DURATION_MINUTES = 43200  # longest duration /createpoll accepts (30 days)
+POLL_EXPIRY_SWEEP_INTERVAL = 30  # seconds between checks for expired polls
+POLL_CLOSE_LEASE = 120  # seconds a process may take to close a poll before the sweep retries it
+POLL_ARCHIVE_TTL = 7776000  # seconds closed polls are kept in the archive (90 days)
+POLL_RELINK_LEASE = 300  # seconds before a failed legacy poll relink is retried
+POLL_RELINK_ATTEMPTS = 3  # relink passes per startup, polls still failing wait for the next start
+
+# Analytics Configuration
+ANALYTICS_CACHE_SIZE = 1000  # analytics results kept in memory
+ANALYTICS_CACHE_TTL = 300  # seconds a cached analytics result is served before it is recomputed
+ANALYTICS_MAX_DAYS = 90  # longest window /pollstats accepts
+
+# Metrics Configuration
+METRICS_ENABLED = True  # serve Prometheus metrics and time MongoDB commands
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# Event Loop Watchdog Configuration
+WATCHDOG_ENABLED = True  # measure loop lag and sample the stack during stalls
+WATCHDOG_INTERVAL = 0.1  # seconds between loop lag measurements
+WATCHDOG_STALL_THRESHOLD = 0.25  # seconds the loop may be blocked before its stack is sampled
+WATCHDOG_REPORT_INTERVAL = 300  # seconds between stall hot spot summaries in the log
+
+# Profiler Configuration
+PROFILER_SAMPLE_INTERVAL = 0.005  # seconds between stack samples while profiling
+PROFILER_MAX_SECONDS = 300  # longest profile /profile accepts
 
 # Logging Configuration
 LOG_LEVEL = "INFO"
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_FILE = 'bot.log'
+LOG_ROTATION = "size"  # "size" or "time"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate bot.log at this size when LOG_ROTATION is "size"
+LOG_ROTATION_WHEN = "midnight"  # rotation schedule when LOG_ROTATION is "time"
+LOG_BACKUP_COUNT = 5  # rotated log files kept
+LOG_JSON = False  # write structured JSON lines instead of LOG_FORMAT
+LOG_QUEUE_SIZE = 10000  # records buffered for the writer thread before dropping
+LOG_LEVELS = {  # per-module level overrides
+    "discord": "INFO",
+    "discord.http": "WARNING"
+}
 
 # Cogs to load
 COGS = [
     "cogs.polls",
     "cogs.reminders",
-    "cogs.custom_commands"
+    "cogs.custom_commands",
+    "cogs.manager",
+    "cogs.analytics"
 ]
@@ -1 +1 @@
-from . import dbmanager, polls_ops, reminder_ops, user_ops, custom_commands_ops
+from . import dbmanager, polls_ops, reminder_ops, user_ops, custom_commands_ops, guild_ops, meta_ops, cluster_ops, analytics_ops, aio, vote_buffer
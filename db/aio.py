@@ -0,0 +1,52 @@
+"""
+Awaitable data-access layer
+
+Exposes the ops modules as coroutine functions that run on a bounded
+thread pool, so database round trips never block the event loop.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import DB_EXECUTOR_MAX_WORKERS
+from . import polls_ops as _polls_ops
+from . import reminder_ops as _reminder_ops
+from . import user_ops as _user_ops
+from . import custom_commands_ops as _custom_commands_ops
+from . import guild_ops as _guild_ops
+from . import meta_ops as _meta_ops
+from . import cluster_ops as _cluster_ops
+from . import analytics_ops as _analytics_ops
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_MAX_WORKERS, thread_name_prefix="db")
+
+async def run(func, *args, **kwargs):
+    """Run a blocking callable on the database executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+class AsyncOps:
+    """Wraps an ops module so every function becomes awaitable"""
+    def __init__(self, module):
+        self._module = module
+    
+    def __getattr__(self, name):
+        func = getattr(self._module, name)
+        if not callable(func):
+            return func
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await run(func, *args, **kwargs)
+        
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, wrapper)
+        return wrapper
+
+polls_ops = AsyncOps(_polls_ops)
+reminder_ops = AsyncOps(_reminder_ops)
+user_ops = AsyncOps(_user_ops)
+custom_commands_ops = AsyncOps(_custom_commands_ops)
+guild_ops = AsyncOps(_guild_ops)
+meta_ops = AsyncOps(_meta_ops)
+cluster_ops = AsyncOps(_cluster_ops)
+analytics_ops = AsyncOps(_analytics_ops)
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+from .dbmanager import polls_collection, poll_votes_collection, poll_archive_collection, vote_stats_collection
+from utils.cache import LRUCache
+from config import ANALYTICS_CACHE_SIZE, ANALYTICS_CACHE_TTL
+
+# (query name, *arguments) -> summarized result
+_results = LRUCache(maxsize=ANALYTICS_CACHE_SIZE, ttl=ANALYTICS_CACHE_TTL)
+
+DAY = timedelta(days=1)
+
+def _cached(key, compute):
+    result = _results.get(key)
+    if result is None:
+        result = compute()
+        _results.set(key, result)
+    
+    return result
+
+def _window_start(days):
+    """Midnight UTC starting a window of `days` days that ends with today"""
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - (days - 1) * DAY
+
+def _votes_since(guild_id, start, stats_match):
+    """
+    Pipeline prefix streaming a guild's votes since start as {user_id, poll_id, day, votes}.
+
+    Votes of open polls come from poll_votes one by one, votes of closed
+    polls from the per-day counts rolled up when they were archived.
+    Voter counts carry no poll_id and poll counts no user_id.
+    """
+    return [
+        {"$match": {"guild_id": guild_id, "voted_at": {"$gte": start}}},
+        {"$project": {"user_id": 1, "poll_id": 1, "day": "$voted_at", "votes": {"$literal": 1}}},
+        {"$unionWith": {"coll": vote_stats_collection.name, "pipeline": [
+            {"$match": {"guild_id": guild_id, "day": {"$gte": start}, **stats_match}},
+            {"$project": {"user_id": 1, "poll_id": 1, "day": 1, "votes": 1, "question": 1}}
+        ]}}
+    ]
+
+def vote_overview(guild_id, days):
+    """
+    Totals, votes per day and the busiest polls of a guild over the last `days` days.
+
+    Returns:
+        dict: {"votes", "voters", "daily": [(day, votes)], "busiest": [(question, votes)]}
+    """
+    def compute():
+        start = _window_start(days)
+        boundaries = [start + i * DAY for i in range(days + 1)]
+        by_voter = {"$match": {"user_id": {"$exists": True}}}
+        
+        result = next(poll_votes_collection.aggregate(_votes_since(guild_id, start, {}) + [
+            {"$facet": {
+                "votes": [by_voter, {"$group": {"_id": None, "n": {"$sum": "$votes"}}}],
+                "voters": [by_voter, {"$group": {"_id": "$user_id"}}, {"$count": "n"}],
+                "daily": [by_voter, {"$bucket": {"groupBy": "$day", "boundaries": boundaries, "default": "later", "output": {"votes": {"$sum": "$votes"}}}}],
+                "busiest": [
+                    {"$match": {"poll_id": {"$exists": True}}},
+                    {"$group": {"_id": "$poll_id", "votes": {"$sum": "$votes"}, "question": {"$max": "$question"}}},
+                    {"$sort": {"votes": -1}},
+                    {"$limit": 5},
+                    {"$lookup": {"from": polls_collection.name, "localField": "_id", "foreignField": "_id", "as": "poll"}},
+                    {"$project": {"votes": 1, "question": {"$ifNull": [{"$first": "$poll.question"}, {"$ifNull": ["$question", "(closed poll)"]}]}}}
+                ]
+            }}
+        ]))
+        
+        return {
+            "votes": result["votes"][0]["n"] if result["votes"] else 0,
+            "voters": result["voters"][0]["n"] if result["voters"] else 0,
+            "daily": [(bucket["_id"], bucket["votes"]) for bucket in result["daily"] if bucket["_id"] != "later"],
+            "busiest": [(poll["question"], poll["votes"]) for poll in result["busiest"]]
+        }
+    
+    return _cached(("overview", guild_id, days), compute)
+
+def top_voters(guild_id, days, limit=10):
+    """Most active voters of a guild over the last `days` days as [(user_id, votes)]"""
+    def compute():
+        cursor = poll_votes_collection.aggregate(_votes_since(guild_id, _window_start(days), {"user_id": {"$exists": True}}) + [
+            {"$group": {"_id": "$user_id", "votes": {"$sum": "$votes"}}},
+            {"$sort": {"votes": -1, "_id": 1}},
+            {"$limit": limit}
+        ])
+        return [(doc["_id"], doc["votes"]) for doc in cursor]
+    
+    return _cached(("top_voters", guild_id, days, limit), compute)
+
+def creator_history(guild_id, creator_id, limit=10):
+    """
+    Poll history of one creator across open and archived polls.
+
+    Returns:
+        dict: {"polls", "votes", "open", "recent": [(question, total_votes, is_open)]}
+    """
+    def compute():
+        match = {"$match": {"guild_id": guild_id, "creator_id": creator_id}}
+        project = {"question": 1, "total_votes": 1, "created_at": 1}
+        
+        result = next(polls_collection.aggregate([
+            match,
+            {"$project": {**project, "open": {"$literal": True}}},
+            {"$unionWith": {"coll": poll_archive_collection.name, "pipeline": [match, {"$project": {**project, "open": {"$literal": False}}}]}},
+            {"$facet": {
+                "summary": [{"$group": {
+                    "_id": None,
+                    "polls": {"$sum": 1},
+                    "votes": {"$sum": "$total_votes"},
+                    "open": {"$sum": {"$cond": ["$open", 1, 0]}}
+                }}],
+                "recent": [{"$sort": {"created_at": -1}}, {"$limit": limit}]
+            }}
+        ]))
+        
+        summary = result["summary"][0] if result["summary"] else {"polls": 0, "votes": 0, "open": 0}
+        return {
+            "polls": summary["polls"],
+            "votes": summary["votes"],
+            "open": summary["open"],
+            "recent": [(poll["question"], poll.get("total_votes", 0), poll["open"]) for poll in result["recent"]]
+        }
+    
+    return _cached(("creator", guild_id, creator_id, limit), compute)
+
+def cache_stats():
+    return _results.stats()
@@ -0,0 +1,39 @@
+import time
+from datetime import datetime, timedelta, timezone
+from .dbmanager import processes_collection, reminder_collection
+from .dbmanager import logger
+
+def heartbeat(process_id, shard_ids, started_at):
+    """Record that a process is alive and which shards it runs"""
+    processes_collection.update_one(
+        {"_id": process_id},
+        {
+            "$set": {"heartbeat_at": datetime.now(timezone.utc), "shard_ids": shard_ids},
+            "$setOnInsert": {"started_at": started_at}
+        },
+        upsert=True
+    )
+
+def live_process_ids(dead_after):
+    """IDs of processes that sent a heartbeat within the last dead_after seconds"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=dead_after)
+    
+    return [doc["_id"] for doc in processes_collection.find({"heartbeat_at": {"$gte": cutoff}}, {"_id": 1})]
+
+def deregister(process_id):
+    processes_collection.delete_one({"_id": process_id})
+    logger.debug(f"Deregistered process {process_id}")
+
+def expire_dead_claims(live_ids):
+    """
+    End the leases held by processes that stopped sending heartbeats.
+
+    Returns the number of reminders released for takeover.
+    """
+    now = time.time()
+    result = reminder_collection.update_many(
+        {"claimed_by": {"$nin": list(live_ids)}, "claim_expires": {"$gt": now}},
+        {"$set": {"claim_expires": now}}
+    )
+    
+    return result.modified_count
@@ -1,17 +1,93 @@
-from .dbmanager import commands_collection
+from pymongo import ReturnDocument
+from .dbmanager import commands_collection, meta_collection
 from .dbmanager import logger
 
-def add_command_doc(command_name, message):
+# Meta document holding one custom command version counter per guild
+REGISTRY_VERSION_ID = "custom_commands_version"
+
+# In-memory command registry, partitioned by guild: guild_id -> {command name -> reply message}
+_registry = {}
+_registry_versions = {}
+
+def _fetch_registry_versions():
+    doc = meta_collection.find_one({"_id": REGISTRY_VERSION_ID}, {"guilds": 1})
+    
+    return {int(guild_id): version for guild_id, version in doc.get("guilds", {}).items()} if doc else {}
+
+def _bump_registry_version(guild_id):
+    """Increment the guild's version counter so other processes reload it"""
+    field = f"guilds.{guild_id}"
+    doc = meta_collection.find_one_and_update(
+        {"_id": REGISTRY_VERSION_ID},
+        {"$inc": {field: 1}},
+        projection={field: 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    # Only adopt the new version if nobody else changed this guild's commands in between
+    version = doc["guilds"][str(guild_id)]
+    if version == _registry_versions.get(guild_id, 0) + 1:
+        _registry_versions[guild_id] = version
+
+def _load_guild_commands(guild_id, version):
+    docs = commands_collection.find({"guild_id": guild_id}, {"_id": 0, "command_name": 1, "message": 1})
+    
+    _registry[guild_id] = {doc["command_name"]: doc["message"] for doc in docs}
+    _registry_versions[guild_id] = version
+
+def load_command_registry():
+    """Load every guild's custom commands into the in-memory registry"""
+    global _registry, _registry_versions
+    
+    # Read the versions first so a concurrent write is picked up by the next refresh
+    versions = _fetch_registry_versions()
+    docs = commands_collection.find({}, {"_id": 0, "guild_id": 1, "command_name": 1, "message": 1})
+    
+    registry = {}
+    for doc in docs:
+        registry.setdefault(doc.get("guild_id"), {})[doc["command_name"]] = doc["message"]
+    
+    _registry = registry
+    _registry_versions = versions
+    logger.info(f"Loaded {registry_size()} custom commands across {len(_registry)} guilds")
+
+def refresh_command_registry():
+    """Reload guilds whose version counter moved. Returns the number of guilds reloaded"""
+    versions = _fetch_registry_versions()
+    changed = [guild_id for guild_id, version in versions.items() if _registry_versions.get(guild_id, 0) != version]
+    
+    for guild_id in changed:
+        _load_guild_commands(guild_id, versions[guild_id])
+    
+    return len(changed)
+
+def resolve_command(guild_id, command_name):
+    """Get the reply for a guild's custom command from the registry, or None"""
+    commands = _registry.get(guild_id)
+    
+    return commands.get(command_name) if commands else None
+
+def command_exists(guild_id, command_name):
+    return command_name in _registry.get(guild_id, ())
+
+def registry_size():
+    return sum(len(commands) for commands in _registry.values())
+
+def add_command_doc(guild_id, command_name, message):
     
     doc = {
+        "guild_id" : guild_id,
         "command_name" : command_name,
         "message" : message
     }
     
     commands_collection.insert_one(doc)
+    _registry.setdefault(guild_id, {})[command_name] = message
+    _bump_registry_version(guild_id)
     
-def get_existing_command_names():
-    docs = commands_collection.find()
+def get_existing_command_names(guild_id):
+    docs = commands_collection.find({"guild_id": guild_id}, {"command_name": 1})
     
     names = []
     
@@ -21,21 +97,45 @@ def get_existing_command_names():
         
     return names
 
-def get_reply(command_name):
-    doc = commands_collection.find_one({"command_name":command_name})
+def get_reply(guild_id, command_name):
+    doc = commands_collection.find_one({"guild_id": guild_id, "command_name": command_name})
     
     msg = doc["message"]
     
     return msg
 
-def rem_custom_command(command_name):
-    result = commands_collection.delete_one({"command_name":command_name})
+def rem_custom_command(guild_id, command_name):
+    result = commands_collection.delete_one({"guild_id": guild_id, "command_name": command_name})
+    _registry.get(guild_id, {}).pop(command_name, None)
     if result.deleted_count > 0:
-        logger.debug(f"Removed custom command: {command_name}")
+        logger.debug(f"Removed custom command {command_name} from guild {guild_id}")
+        _bump_registry_version(guild_id)
     else:
-        logger.warning(f"No custom command found with name: {command_name}")
+        logger.warning(f"No custom command found with name {command_name} in guild {guild_id}")
+    
+def get_all_commands(guild_id):
+    commands = list(commands_collection.find({"guild_id": guild_id}))
+    
+    return commands
+
+def get_commands_page(guild_id, after=None, limit=10):
+    """
+    Get one page of a guild's custom command names in alphabetical order.
+
+    Args:
+        after: name of the last command of the previous page.
+    """
+    query = {"guild_id": guild_id}
+    if after:
+        query["command_name"] = {"$gt": after}
     
-def get_all_commands():
-    commands = commands_collection.find()
+    cursor = commands_collection.find(query, {"_id": 0, "command_name": 1}).sort("command_name", 1).limit(limit)
+    return list(cursor)
+
+def backfill_guild_id(guild_id):
+    """Assign commands created before guild scoping to the given guild"""
+    result = commands_collection.update_many({"guild_id": {"$exists": False}}, {"$set": {"guild_id": guild_id}})
     
-    return commands
\ No newline at end of file
+    if result.modified_count:
+        logger.info(f"Assigned {result.modified_count} legacy custom commands to guild {guild_id}")
+        _bump_registry_version(guild_id)
@@ -2,52 +2,151 @@ from pymongo import MongoClient
 import dotenv
 import os
 import logging
+from config import METRICS_ENABLED, PROCESS_RECORD_TTL, POLL_ARCHIVE_TTL
+from utils.metrics import MongoCommandTimer
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
 dotenv.load_dotenv(dotenv.find_dotenv())
 CONN_STR = os.getenv("MONGO_CONN_STR")
+DB_NAME = os.getenv("MONGO_DB_NAME", "theseusdb")
 
-client = MongoClient(CONN_STR)
+if CONN_STR and CONN_STR.startswith("mongomock://"):
+    # In-process stand-in used by the benchmark suite
+    import mongomock
+    client = mongomock.MongoClient()
+else:
+    client = MongoClient(CONN_STR, event_listeners=[MongoCommandTimer()] if METRICS_ENABLED else [])
 
 
 
-theseusdb = client.theseusdb
+theseusdb = client[DB_NAME]
 reminder_collection = theseusdb.reminder_collection
 timezones_collection = theseusdb.timezones_collection
 polls_collection = theseusdb.polls_collection
 commands_collection = theseusdb.commands_collection
+meta_collection = theseusdb.meta_collection
+poll_votes_collection = theseusdb.poll_votes_collection
+guild_settings_collection = theseusdb.guild_settings_collection
+processes_collection = theseusdb.processes_collection
+poll_archive_collection = theseusdb.poll_archive_collection
+vote_stats_collection = theseusdb.vote_stats_collection
     
   
 
     
-def ensure_indexes():
+def ensure_unique_indexes():
+    """Create the unique indexes that writes rely on to reject duplicates"""
     try:
         # Unique job_id to prevent duplicate records
         reminder_collection.create_index([
             ("job_id", 1)
         ], name="job_id_unique", unique=True)
 
-        # Helpful lookups
-        reminder_collection.create_index([
-            ("userId", 1)
-        ], name="userId_idx")
-        reminder_collection.create_index([
-            ("time", 1)
-        ], name="time_idx")
-
         # Ensure single timezone per user
         timezones_collection.create_index([
             ("userId", 1)
         ], name="userId_tz_unique", unique=True)
+
+        # One vote document per user per poll
+        poll_votes_collection.create_index([
+            ("poll_id", 1),
+            ("user_id", 1)
+        ], name="poll_user_unique", unique=True)
+
+        # Custom command names are unique within a guild, the same name may exist in many guilds
+        if "command_name_unique" in commands_collection.index_information():
+            commands_collection.drop_index("command_name_unique")
+        commands_collection.create_index([
+            ("guild_id", 1),
+            ("command_name", 1)
+        ], name="guild_command_name_unique", unique=True)
+
+        # One settings document per guild
+        guild_settings_collection.create_index([
+            ("guild_id", 1)
+        ], name="guild_id_unique", unique=True)
+
+        # One rolled up count per voter per day, a retried poll close relies on it to not count votes twice
+        vote_stats_collection.create_index([
+            ("guild_id", 1),
+            ("day", 1),
+            ("user_id", 1)
+        ], name="voter_day_unique", unique=True, partialFilterExpression={"user_id": {"$exists": True}})
     except Exception as e:
-        logger.warning(f"Index creation warning: {e}")
-        
+        logger.warning(f"Unique index creation warning: {e}")
 
+def ensure_indexes():
+    """Create the indexes that only speed up queries"""
+    try:
+        # Backs /listreminders paging, also serves plain userId lookups
+        if "userId_idx" in reminder_collection.index_information():
+            reminder_collection.drop_index("userId_idx")
+        reminder_collection.create_index([
+            ("userId", 1),
+            ("time", 1),
+            ("_id", 1)
+        ], name="userId_time_idx")
+        reminder_collection.create_index([
+            ("time", 1)
+        ], name="time_idx")
+
+        # Only claimed reminders carry a lease, used to find claims left behind by dead processes
+        reminder_collection.create_index([
+            ("claim_expires", 1)
+        ], name="claim_expires_idx", sparse=True)
+
+        # Process heartbeats, records of stopped processes expire on their own
+        processes_collection.create_index([
+            ("heartbeat_at", 1)
+        ], name="heartbeat_ttl", expireAfterSeconds=PROCESS_RECORD_TTL)
 
-# Initialize indexes on import
-ensure_indexes()
+        # Analytics: a guild's votes over time, a creator's polls
+        poll_votes_collection.create_index([
+            ("guild_id", 1),
+            ("voted_at", 1)
+        ], name="guild_voted_at_idx")
+        polls_collection.create_index([
+            ("guild_id", 1),
+            ("creator_id", 1)
+        ], name="guild_creator_idx")
+        poll_archive_collection.create_index([
+            ("guild_id", 1),
+            ("creator_id", 1)
+        ], name="guild_creator_idx")
+
+        # Only polls with a duration expire, the sweep looks them up by deadline
+        polls_collection.create_index([
+            ("expires_at", 1)
+        ], name="expires_at_idx", sparse=True)
+        polls_collection.create_index([
+            ("closing", 1)
+        ], name="closing_idx", sparse=True)
+
+        # Archived polls are purged after POLL_ARCHIVE_TTL
+        poll_archive_collection.create_index([
+            ("closed_at", 1)
+        ], name="closed_at_ttl", expireAfterSeconds=POLL_ARCHIVE_TTL)
+
+        # Vote counts rolled up from closed polls, purged along with the archive
+        vote_stats_collection.create_index([
+            ("guild_id", 1),
+            ("day", 1)
+        ], name="guild_day_idx")
+        vote_stats_collection.create_index([
+            ("day", 1)
+        ], name="day_ttl", expireAfterSeconds=POLL_ARCHIVE_TTL)
+
+        # Poll listings are per guild, newest first
+        if "guild_id_idx" in polls_collection.index_information():
+            polls_collection.drop_index("guild_id_idx")
+        polls_collection.create_index([
+            ("guild_id", 1),
+            ("_id", -1)
+        ], name="guild_polls_idx")
+    except Exception as e:
+        logger.warning(f"Index creation warning: {e}")
     
     
     
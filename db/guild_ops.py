@@ -0,0 +1,42 @@
+from pymongo import ReturnDocument
+from .dbmanager import guild_settings_collection
+from .dbmanager import logger
+from utils.cache import LRUCache
+from config import COMMAND_PREFIX, GUILD_SETTINGS_CACHE_SIZE, GUILD_SETTINGS_CACHE_TTL
+
+# Settings used for any field a guild hasn't set
+DEFAULT_SETTINGS = {
+    "prefix": COMMAND_PREFIX
+}
+
+# guild_id -> settings dict with defaults applied
+_settings_cache = LRUCache(maxsize=GUILD_SETTINGS_CACHE_SIZE, ttl=GUILD_SETTINGS_CACHE_TTL)
+
+def cached_guild_settings(guild_id):
+    """Get a guild's settings from the cache without any I/O, or None"""
+    return _settings_cache.get(guild_id)
+
+def get_guild_settings(guild_id):
+    """Get a guild's settings, loading them on a cache miss"""
+    settings = _settings_cache.get(guild_id)
+    if settings is None:
+        doc = guild_settings_collection.find_one({"guild_id": guild_id}, {"_id": 0, "guild_id": 0})
+        settings = {**DEFAULT_SETTINGS, **(doc or {})}
+        _settings_cache.set(guild_id, settings)
+    
+    return settings
+
+def update_guild_settings(guild_id, **fields):
+    doc = guild_settings_collection.find_one_and_update(
+        {"guild_id": guild_id},
+        {"$set": fields},
+        projection={"_id": 0, "guild_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    # Other processes pick the change up once their cached copy expires
+    _settings_cache.set(guild_id, {**DEFAULT_SETTINGS, **doc})
+    logger.debug(f"Updated settings {list(fields)} for guild {guild_id}")
+
+def settings_cache_stats():
+    return _settings_cache.stats()
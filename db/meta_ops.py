@@ -0,0 +1,20 @@
+from .dbmanager import meta_collection
+
+COMMAND_TREE_HASH_PREFIX = "command_tree_hash"
+
+def _command_tree_id(application_id, scope):
+    return f"{COMMAND_TREE_HASH_PREFIX}:{application_id}:{scope}"
+
+def get_command_tree_hashes(application_id, scopes):
+    """Fingerprints of the command trees last synced to each scope (guild id or "global"), in one query"""
+    ids = {_command_tree_id(application_id, scope): scope for scope in scopes}
+    docs = meta_collection.find({"_id": {"$in": list(ids)}}, {"hash": 1})
+    
+    return {ids[doc["_id"]]: doc["hash"] for doc in docs}
+
+def set_command_tree_hash(application_id, scope, digest):
+    meta_collection.update_one(
+        {"_id": _command_tree_id(application_id, scope)},
+        {"$set": {"hash": digest}},
+        upsert=True
+    )
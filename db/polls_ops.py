@@ -1,21 +1,126 @@
-from .dbmanager import polls_collection
+from .dbmanager import polls_collection, poll_votes_collection, poll_archive_collection, vote_stats_collection, meta_collection
 from .dbmanager import logger
 from bson.objectid import ObjectId
+from datetime import datetime, timezone
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from config import POLL_CLOSE_LEASE
+import time
 
-def rem_poll_doc(poll_id):
+# cast_vote outcomes
+VOTE_RECORDED = "recorded"
+VOTE_UNCHANGED = "unchanged"
+POLL_NOT_FOUND = "not_found"
+POLL_CLOSED = "closed"
+
+# Meta document marking the vote guild_id backfill as done
+VOTE_GUILD_BACKFILL_ID = "vote_guild_backfill"
+
+# Fields needed to render a poll, never includes per-user data
+POLL_RENDER_PROJECTION = {
+    "question": 1,
+    "options": 1,
+    "counts": 1,
+    "total_votes": 1,
+    "creator_id": 1,
+    "poll_msg_id": 1,
+    "channel_id": 1,
+    "expires_at": 1,
+    "version": 1
+}
+
+# Fields kept when a poll is archived, voter data is dropped
+POLL_ARCHIVE_PROJECTION = {
+    "guild_id": 1,
+    "question": 1,
+    "options": 1,
+    "counts": 1,
+    "total_votes": 1,
+    "creator_id": 1,
+    "channel_id": 1,
+    "poll_msg_id": 1,
+    "created_at": 1
+}
+
+def _guild_filter(query, guild_id):
+    """Restrict a poll query to one guild when a guild is given"""
+    if guild_id is not None:
+        query["guild_id"] = guild_id
+    return query
+
+# Fields shown in poll listings
+POLL_LIST_PROJECTION = {
+    "question": 1,
+    "poll_msg_id": 1,
+    "total_votes": 1
+}
+
+def _roll_up_votes(poll):
+    """
+    Fold a closing poll's votes into per-day counts per voter and per poll,
+    so analytics keep counting them after the votes are deleted.
+
+    Safe to repeat when a failed close is retried: poll counts are set, not
+    added, and a voter count only grows by polls not yet in its polls list.
+    """
+    result = next(poll_votes_collection.aggregate([
+        # Votes migrated from legacy polls have no timestamp to file them under
+        {"$match": {"poll_id": poll["_id"], "voted_at": {"$type": "date"}}},
+        {"$set": {"day": {"$dateFromParts": {"year": {"$year": "$voted_at"}, "month": {"$month": "$voted_at"}, "day": {"$dayOfMonth": "$voted_at"}}}}},
+        {"$facet": {
+            "voters": [{"$group": {"_id": {"day": "$day", "user_id": "$user_id"}, "votes": {"$sum": 1}}}],
+            "days": [{"$group": {"_id": "$day", "votes": {"$sum": 1}}}]
+        }}
+    ]))
+    
+    guild_id = poll.get("guild_id")
+    ops = [
+        # Once the poll is counted the filter misses and the upsert hits voter_day_unique instead
+        UpdateOne(
+            {"guild_id": guild_id, "day": row["_id"]["day"], "user_id": row["_id"]["user_id"], "polls": {"$ne": poll["_id"]}},
+            {"$inc": {"votes": row["votes"]}, "$push": {"polls": poll["_id"]}},
+            upsert=True
+        )
+        for row in result["voters"]
+    ]
+    ops.extend(
+        UpdateOne(
+            {"guild_id": guild_id, "day": row["_id"], "poll_id": poll["_id"]},
+            {"$set": {"votes": row["votes"], "question": poll.get("question")}},
+            upsert=True
+        )
+        for row in result["days"]
+    )
+    
+    # A duplicate key is a voter already counted, or a row another poll closing
+    # the same day created first, which the second pass then updates
+    for _ in range(2):
+        if not ops:
+            return
+        try:
+            vote_stats_collection.bulk_write(ops, ordered=False)
+            return
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]) or e.details.get("writeConcernErrors"):
+                raise
+            ops = [ops[error["index"]] for error in e.details["writeErrors"]]
+
+def rem_poll_doc(poll_id, guild_id=None):
     try:
         # Try to find by ObjectId first
         try:
-            result = polls_collection.delete_one({"_id": ObjectId(poll_id)})
-            if result.deleted_count > 0:
-                logger.debug(f"Deleted poll by ObjectId {poll_id}")
-                return True
+            poll = polls_collection.find_one(_guild_filter({"_id": ObjectId(poll_id)}, guild_id), projection={"guild_id": 1, "question": 1})
         except:
             # If ObjectId fails, try by message ID
-            result = polls_collection.delete_one({"poll_msg_id": poll_id})
-            if result.deleted_count > 0:
-                logger.debug(f"Deleted poll by message ID {poll_id}")
-                return True
+            poll = polls_collection.find_one(_guild_filter({"poll_msg_id": poll_id}, guild_id), projection={"guild_id": 1, "question": 1})
+        
+        if poll:
+            # Poll goes last, if anything before fails the delete can be retried without losing or doubling votes
+            _roll_up_votes(poll)
+            poll_votes_collection.delete_many({"poll_id": poll["_id"]})
+            polls_collection.delete_one({"_id": poll["_id"]})
+            logger.debug(f"Deleted poll {poll_id}")
+            return True
         
         logger.warning(f"No poll found with ID {poll_id}")
         return False
@@ -23,21 +128,368 @@ def rem_poll_doc(poll_id):
         logger.error(f"Error deleting poll {poll_id}: {e}")
         return False
 
-def get_poll_by_id(poll_id):
-    """Get poll by either ObjectId or message ID"""
+def archive_poll(poll_id, guild_id=None, reason="closed"):
+    """
+    Close a poll, keeping only its final counts in the archive.
+
+    The poll is first marked closing, which stops new votes and lets only
+    one process close it. The archive record and vote rollups are written
+    next and the poll is deleted last, so if any step fails the poll stays
+    in place and is closed again once the POLL_CLOSE_LEASE lapses.
+
+    Returns:
+        dict: The archive record, or None if no open poll matched.
+    """
+    try:
+        query = {"_id": ObjectId(poll_id)}
+    except Exception:
+        query = {"poll_msg_id": poll_id}
+    
+    now = time.time()
+    # Not closing, or the process closing it stopped before finishing
+    query["closing"] = {"$not": {"$gt": now - POLL_CLOSE_LEASE}}
+    
+    poll = polls_collection.find_one_and_update(
+        _guild_filter(query, guild_id),
+        {"$set": {"closing": now}},
+        projection=POLL_ARCHIVE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not poll:
+        return None
+    
+    archive = {**poll, "closed_at": datetime.now(timezone.utc), "close_reason": reason}
+    poll_archive_collection.replace_one({"_id": poll["_id"]}, archive, upsert=True)
+    _roll_up_votes(poll)
+    poll_votes_collection.delete_many({"poll_id": poll["_id"]})
+    polls_collection.delete_one({"_id": poll["_id"]})
+    logger.debug(f"Archived poll {poll['_id']} ({reason})")
+    
+    return archive
+
+def get_expired_poll_ids(now, limit=100):
+    """IDs of polls whose duration ran out before now, or whose closing was left unfinished"""
+    cursor = polls_collection.find(
+        {"$or": [{"expires_at": {"$lte": now}}, {"closing": {"$lte": now - POLL_CLOSE_LEASE}}]},
+        {"_id": 1}
+    ).limit(limit)
+    return [str(doc["_id"]) for doc in cursor]
+
+def get_poll_by_id(poll_id, guild_id=None):
+    """Get poll by either ObjectId or message ID, optionally only within one guild"""
     try:
         # Try ObjectId first
-        poll = polls_collection.find_one({"_id": ObjectId(poll_id)})
+        poll = polls_collection.find_one(_guild_filter({"_id": ObjectId(poll_id)}, guild_id))
         if poll:
             return poll
     except:
         pass
     
     # Try message ID
-    poll = polls_collection.find_one({"poll_msg_id": poll_id})
+    poll = polls_collection.find_one(_guild_filter({"poll_msg_id": poll_id}, guild_id))
     return poll
     
-def get_all_polls():
-    polls = polls_collection.find()
+def get_all_polls(guild_id):
+    polls = list(polls_collection.find({"guild_id": guild_id}))
     
     return polls
+
+def get_polls_page(guild_id, after=None, limit=10):
+    """
+    Get one page of a guild's polls, newest first, with only the listed fields.
+
+    Args:
+        after: _id of the last poll of the previous page.
+    """
+    query = {"guild_id": guild_id}
+    if after:
+        query["_id"] = {"$lt": after}
+    
+    cursor = polls_collection.find(query, POLL_LIST_PROJECTION).sort("_id", -1).limit(limit)
+    return list(cursor)
+
+def claim_legacy_poll(now, lease):
+    """
+    Lease one poll whose message still has pre-persistent buttons, so no
+    other process picks it too. A poll whose relink failed is claimable
+    again once its lease expires. Returns None when none is left.
+    """
+    return polls_collection.find_one_and_update(
+        {"persistent": {"$exists": False}, "relink_expires": {"$not": {"$gt": now}}},
+        {"$set": {"relink_expires": now + lease}},
+        projection={"options": 1, "channel_id": 1, "poll_msg_id": 1}
+    )
+
+def mark_poll_relinked(poll_id):
+    """Record that a legacy poll's message now has persistent buttons"""
+    polls_collection.update_one(
+        {"_id": ObjectId(poll_id)},
+        {"$set": {"persistent": True}, "$unset": {"relink_expires": ""}}
+    )
+
+def backfill_guild_id(guild_id):
+    """Assign polls created before guild scoping to the given guild"""
+    result = polls_collection.update_many({"guild_id": {"$exists": False}}, {"$set": {"guild_id": guild_id}})
+    
+    if result.modified_count:
+        logger.info(f"Assigned {result.modified_count} legacy polls to guild {guild_id}")
+
+def backfill_vote_guild_ids():
+    """
+    Copy each poll's guild_id onto its votes cast before votes carried one, server-side.
+
+    Votes of polls that no longer exist can never get one and are deleted.
+    Completion is recorded in the meta collection so later starts skip it.
+    """
+    if meta_collection.find_one({"_id": VOTE_GUILD_BACKFILL_ID}, {"_id": 1}):
+        return
+    
+    legacy = {"guild_id": {"$exists": False}}
+    if poll_votes_collection.find_one(legacy, {"_id": 1}):
+        poll_votes_collection.aggregate([
+            {"$match": legacy},
+            {"$lookup": {"from": polls_collection.name, "localField": "poll_id", "foreignField": "_id", "as": "poll"}},
+            {"$unwind": "$poll"},
+            {"$project": {"guild_id": "$poll.guild_id"}},
+            {"$merge": {"into": poll_votes_collection.name, "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+        ])
+        
+        remaining = poll_votes_collection.distinct("poll_id", legacy)
+        live = set(polls_collection.distinct("_id", {"_id": {"$in": remaining}}))
+        orphaned = [poll_id for poll_id in remaining if poll_id not in live]
+        if orphaned:
+            deleted = poll_votes_collection.delete_many({**legacy, "poll_id": {"$in": orphaned}}).deleted_count
+            logger.info(f"Deleted {deleted} legacy votes of {len(orphaned)} polls that no longer exist")
+        logger.info("Backfilled guild_id on legacy poll votes")
+        
+        # Polls still without a guild (no GUILD_ID configured) keep their votes waiting for the next start
+        if poll_votes_collection.find_one(legacy, {"_id": 1}):
+            return
+    
+    meta_collection.update_one(
+        {"_id": VOTE_GUILD_BACKFILL_ID},
+        {"$set": {"done_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+def create_poll_doc(poll_data):
+    """Store a new poll and return its ObjectId as a string"""
+    option_count = len(poll_data["options"])
+    poll_data.setdefault("counts", {str(i): 0 for i in range(option_count)})
+    poll_data.setdefault("total_votes", 0)
+    poll_data.setdefault("version", 0)
+    poll_data.setdefault("persistent", True)
+    
+    result = polls_collection.insert_one(poll_data)
+    logger.debug(f"Created poll {result.inserted_id}")
+    
+    return str(result.inserted_id)
+
+def cast_vote(poll_id, option_index, user_id, guild_id=None):
+    """
+    Record a user's vote, moving it away from any other option.
+
+    The vote document is upserted in poll_votes and the poll's per-option
+    counters are adjusted with a single $inc, so concurrent clicks never
+    overwrite each other.
+
+    Returns:
+        tuple: (status, poll_data). poll_data holds the updated counters
+        when status is VOTE_RECORDED, otherwise None.
+    """
+    poll_oid = ObjectId(poll_id)
+    option = str(option_index)
+    # guild_id on votes lets analytics aggregate a guild's votes without joining polls
+    vote = {"option": option, "voted_at": datetime.now(timezone.utc)}
+    if guild_id is not None:
+        vote["guild_id"] = guild_id
+    
+    try:
+        # Matches only if the user has no vote yet or voted for another option
+        previous = poll_votes_collection.find_one_and_update(
+            {"poll_id": poll_oid, "user_id": user_id, "option": {"$ne": option}},
+            {"$set": vote},
+            projection={"option": 1, "voted_at": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # The user's existing vote is already on this option
+        return VOTE_UNCHANGED, None
+    
+    # version orders tallies so renderers can discard stale snapshots
+    if previous:
+        inc = {f"counts.{option}": 1, f"counts.{previous['option']}": -1, "version": 1}
+    else:
+        inc = {f"counts.{option}": 1, "total_votes": 1, "version": 1}
+    
+    # Votes after the deadline don't count, even before the sweep archives the poll
+    poll_data = polls_collection.find_one_and_update(
+        {"_id": poll_oid, "closing": {"$exists": False}, "expires_at": {"$not": {"$lte": time.time()}}},
+        {"$inc": inc},
+        projection=POLL_RENDER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if not poll_data:
+        # Poll was closed in the meantime, put the user's vote back as it was
+        if previous:
+            poll_votes_collection.update_one(
+                {"poll_id": poll_oid, "user_id": user_id},
+                {"$set": {"option": previous["option"], "voted_at": previous.get("voted_at")}}
+            )
+        else:
+            poll_votes_collection.delete_one({"poll_id": poll_oid, "user_id": user_id})
+        
+        if polls_collection.find_one({"_id": poll_oid}, {"_id": 1}):
+            return POLL_CLOSED, None
+        return POLL_NOT_FOUND, None
+    
+    return VOTE_RECORDED, poll_data
+
+def migrate_legacy_votes():
+    """Move voter lists from the old embedded votes map into poll_votes"""
+    migrated = 0
+    
+    for poll in polls_collection.find({"votes": {"$exists": True}}, {"votes": 1, "guild_id": 1}):
+        counts = {}
+        ops = []
+        # Carry the guild over now, the vote guild_id backfill only runs once
+        guild = {"guild_id": poll["guild_id"]} if "guild_id" in poll else {}
+        
+        for option, voters in poll["votes"].items():
+            counts[option] = len(voters)
+            for user_id in voters:
+                ops.append(UpdateOne(
+                    {"poll_id": poll["_id"], "user_id": user_id},
+                    {"$setOnInsert": {"option": option, **guild}},
+                    upsert=True
+                ))
+        
+        if ops:
+            poll_votes_collection.bulk_write(ops, ordered=False)
+        
+        polls_collection.update_one(
+            {"_id": poll["_id"]},
+            {"$set": {"counts": counts, "total_votes": sum(counts.values())}, "$unset": {"votes": ""}}
+        )
+        migrated += 1
+    
+    if migrated:
+        logger.info(f"Migrated votes of {migrated} legacy polls into poll_votes")
+
+def _previous_choices(poll_oid, user_ids):
+    """Map user id -> persisted option for the given voters"""
+    docs = poll_votes_collection.find(
+        {"poll_id": poll_oid, "user_id": {"$in": list(user_ids)}},
+        {"user_id": 1, "option": 1}
+    )
+    
+    return {doc["user_id"]: doc["option"] for doc in docs}
+
+def _previous_choices_batch(batch):
+    """Map (poll ObjectId, user id) -> persisted option for every voter of a batch, in one query"""
+    user_ids = {user_id for choices in batch.values() for user_id in choices}
+    docs = poll_votes_collection.find(
+        {"poll_id": {"$in": list(batch)}, "user_id": {"$in": list(user_ids)}},
+        {"poll_id": 1, "user_id": 1, "option": 1}
+    )
+    
+    # The $in pair also matches voters of other polls in the batch, keep only the asked ones
+    return {
+        (doc["poll_id"], doc["user_id"]): doc["option"]
+        for doc in docs
+        if doc["user_id"] in batch[doc["poll_id"]]
+    }
+
+def poll_is_open(poll_id):
+    """True if the poll exists, isn't being closed and its duration hasn't run out"""
+    return polls_collection.count_documents(
+        {"_id": ObjectId(poll_id), "closing": {"$exists": False}, "expires_at": {"$not": {"$lte": time.time()}}},
+        limit=1
+    ) > 0
+
+def get_user_vote(poll_id, user_id):
+    """Get the option of a user's persisted vote on a poll, or None"""
+    doc = poll_votes_collection.find_one({"poll_id": ObjectId(poll_id), "user_id": user_id}, {"option": 1})
+    return doc["option"] if doc else None
+
+def apply_vote_batch(batch):
+    """
+    Persist buffered votes with one bulk_write per collection.
+
+    Args:
+        batch: {poll_id: {user_id: option}} holding the latest choice per user.
+
+    Returns:
+        dict: poll_id -> updated poll tally for every poll that still exists.
+    """
+    poll_oids = {poll_id: ObjectId(poll_id) for poll_id in batch}
+    # Polls being closed already have their final counts archived
+    existing = {doc["_id"]: doc.get("guild_id") for doc in polls_collection.find({"_id": {"$in": list(poll_oids.values())}, "closing": {"$exists": False}}, {"guild_id": 1})}
+    now = datetime.now(timezone.utc)
+    vote_ops = []
+    poll_ops = []
+    
+    # Polls closed before the flush are skipped, their votes are dropped
+    previous = _previous_choices_batch({poll_oids[poll_id]: choices for poll_id, choices in batch.items() if poll_oids[poll_id] in existing})
+    
+    for poll_id, choices in batch.items():
+        poll_oid = poll_oids[poll_id]
+        if poll_oid not in existing:
+            continue
+        
+        inc = {}
+        
+        for user_id, option in choices.items():
+            old = previous.get((poll_oid, user_id))
+            if old == option:
+                continue
+            
+            vote_ops.append(UpdateOne(
+                {"poll_id": poll_oid, "user_id": user_id},
+                {"$set": {"option": option, "voted_at": now, "guild_id": existing[poll_oid]}},
+                upsert=True
+            ))
+            inc[f"counts.{option}"] = inc.get(f"counts.{option}", 0) + 1
+            if old is None:
+                inc["total_votes"] = inc.get("total_votes", 0) + 1
+            else:
+                inc[f"counts.{old}"] = inc.get(f"counts.{old}", 0) - 1
+        
+        if inc:
+            inc["version"] = 1
+            poll_ops.append(UpdateOne({"_id": poll_oid}, {"$inc": inc}))
+    
+    if vote_ops:
+        poll_votes_collection.bulk_write(vote_ops, ordered=False)
+    if poll_ops:
+        polls_collection.bulk_write(poll_ops, ordered=False)
+    
+    logger.debug(f"Flushed {len(vote_ops)} buffered votes across {len(poll_ops)} polls")
+    
+    tallies = polls_collection.find({"_id": {"$in": list(existing)}}, POLL_RENDER_PROJECTION)
+    return {str(doc["_id"]): doc for doc in tallies}
+
+def get_poll_with_pending(poll_id, pending):
+    """Get a poll with not-yet-flushed votes applied on top of its counters"""
+    poll_data = get_poll_by_id(poll_id)
+    if not poll_data or not pending:
+        return poll_data
+    
+    previous = _previous_choices(poll_data["_id"], pending)
+    counts = dict(poll_data["counts"])
+    total_votes = poll_data.get("total_votes", 0)
+    
+    for user_id, option in pending.items():
+        old = previous.get(user_id)
+        if old == option:
+            continue
+        
+        counts[option] = counts.get(option, 0) + 1
+        if old is None:
+            total_votes += 1
+        else:
+            counts[old] -= 1
+    
+    return {**poll_data, "counts": counts, "total_votes": total_votes}
@@ -1,7 +1,8 @@
+import time
+import uuid
+from pymongo import ReturnDocument
 from .dbmanager import reminder_collection
 from .dbmanager import logger
-from .user_ops import get_user_tz
-from utils import utils
 
 
 def remove_rem_doc(jobId):
@@ -11,33 +12,112 @@ def remove_rem_doc(jobId):
     else:
         logger.warning(f"No reminder document found for job {jobId}")
 
+def claim_reminder(jobId, owner, lease):
+    """
+    Atomically lease a due reminder for delivery by one process.
+
+    The claim succeeds if the reminder is unclaimed or its previous lease
+    expired. The reminder stays stored until complete_reminder, so a
+    process dying mid-delivery leaves it for another to take over.
+
+    Returns the reminder document, or None if it was already fired,
+    cancelled or is leased by another process.
+    """
+    now = time.time()
+    return reminder_collection.find_one_and_update(
+        {"job_id": jobId, "claim_expires": {"$not": {"$gt": now}}},
+        {"$set": {"claimed_by": owner, "claim_expires": now + lease}},
+        return_document=ReturnDocument.AFTER
+    )
+
+def complete_reminder(jobId, owner):
+    """Delete a delivered reminder, only if this process still holds its claim"""
+    reminder_collection.delete_one({"job_id": jobId, "claimed_by": owner})
+
+def get_orphaned_reminders(now, limit=500):
+    """Get reminders whose claim lapsed before delivery completed"""
+    cursor = reminder_collection.find({"claim_expires": {"$lte": now}}).sort("claim_expires", 1).limit(limit)
+    return list(cursor)
+
+def cancel_reminder(jobId, userId):
+    """Delete one of the user's reminders. Returns True if it existed"""
+    result = reminder_collection.delete_one({"job_id": jobId, "userId": userId})
+    if result.deleted_count > 0:
+        logger.debug(f"Cancelled reminder {jobId} for user {userId}")
+        return True
+    
+    return False
+
+def remove_reminders(jobIds, owner=None):
+    """Delete a batch of delivered reminders, only those claimed by owner if given"""
+    query = {"job_id": {"$in": list(jobIds)}}
+    if owner is not None:
+        query["claimed_by"] = owner
+    
+    result = reminder_collection.delete_many(query)
+    logger.debug(f"Removed {result.deleted_count} reminder documents")
+
 def list_user_reminders(userId):
-    return list(reminder_collection.find({"userId": userId}))
+    return list(reminder_collection.find({"userId": userId}).sort("time", 1))
+
+def get_user_reminders_page(userId, after=None, limit=10):
+    """
+    Get one page of a user's reminders ordered by due time.
+
+    Args:
+        after: (time, _id) of the last reminder of the previous page.
+    """
+    query = {"userId": userId}
+    if after:
+        after_time, after_id = after
+        query["$or"] = [
+            {"time": {"$gt": after_time}},
+            {"time": after_time, "_id": {"$gt": after_id}}
+        ]
+    
+    cursor = reminder_collection.find(query, {"time": 1, "job_id": 1, "title": 1}).sort([("time", 1), ("_id", 1)]).limit(limit)
+    return list(cursor)
 
 def get_reminder_by_job_id(jobId):
     return reminder_collection.find_one({"job_id": jobId})
 
-def get_missed_reminders():
-    """Get all reminders that should have already been sent"""
-    import time
-    current_timestamp = int(time.time())
-    
-    # Find reminders where time < current time (past due)
-    missed = list(reminder_collection.find({
-        "time": {"$lt": current_timestamp}
-    }))
+def get_reminders_page(start, end, after=None, limit=500):
+    """
+    Get one page of reminders due in [start, end), ordered by time.
+
+    Args:
+        after: (time, _id) of the last reminder of the previous page.
+    """
+    query = {"time": {"$gte": start, "$lt": end}}
+    if after:
+        after_time, after_id = after
+        query["$or"] = [
+            {"time": {"$gt": after_time}},
+            {"time": after_time, "_id": {"$gt": after_id}}
+        ]
     
-    return missed
+    cursor = reminder_collection.find(query).sort([("time", 1), ("_id", 1)]).limit(limit)
+    return list(cursor)
 
 def get_active_job_ids():
     """Get list of all job IDs that currently exist in scheduler"""
     # You'll call this from bot.py since scheduler is there
     pass
   
-def create_rem_doc(userId, title, desc, date, time, jobId):
+def create_reminder(userId, title, desc, run_at):
+    """
+    Store a reminder. The document itself is the scheduled job.
+
+    Args:
+        run_at: UTC unix timestamp the reminder is due at.
+
+    Returns:
+        str: The job ID identifying the reminder.
+    """
+    jobId = uuid.uuid4().hex
     doc = {
         "userId" : userId,
-        "time" : utils.user_input_to_utc_unix(date, time, get_user_tz(userId)),
+        "time" : run_at,
         "job_id": jobId,
         
         "title" : title,
@@ -45,4 +125,6 @@ def create_rem_doc(userId, title, desc, date, time, jobId):
     }
     
     reminder_collection.insert_one(doc)
-    logger.debug(f"Created reminder document for job {jobId}")
\ No newline at end of file
+    logger.debug(f"Created reminder document for job {jobId}")
+    
+    return jobId
\ No newline at end of file
@@ -1,23 +1,79 @@
-from .dbmanager import timezones_collection
+import pytz
+from pymongo import ReturnDocument
+from .dbmanager import timezones_collection, meta_collection
 from .dbmanager import logger
+from utils.cache import LRUCache
+from config import TZ_CACHE_SIZE, TZ_CACHE_TTL, TZ_CACHE_NEGATIVE_TTL
 
+# Meta document counting timezone changes, so other processes know to drop their caches
+TZ_VERSION_ID = "timezones_version"
+
+# userId -> (timezone name, tzinfo), ("-1", None) for users without a timezone
+_tz_cache = LRUCache(maxsize=TZ_CACHE_SIZE, ttl=TZ_CACHE_TTL)
+_tz_version = 0
+
+def _bump_tz_version():
+    """Increment the timezone version counter so other processes drop their cached timezones"""
+    global _tz_version
+    doc = meta_collection.find_one_and_update(
+        {"_id": TZ_VERSION_ID},
+        {"$inc": {"version": 1}},
+        projection={"version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    # Only adopt the new version if nobody else changed a timezone in between
+    if doc["version"] == _tz_version + 1:
+        _tz_version = doc["version"]
+
+def refresh_tz_cache():
+    """Drop every cached timezone if another process changed one. Returns True if the cache was cleared"""
+    global _tz_version
+    doc = meta_collection.find_one({"_id": TZ_VERSION_ID}, {"version": 1})
+    version = doc["version"] if doc else 0
+    
+    if version == _tz_version:
+        return False
+    
+    _tz_cache.clear()
+    _tz_version = version
+    return True
 
 def create_tz_doc(userId, timezone):
-    doc = {
-        "userId": userId,
-        "timezone": timezone
-    }
-    if not timezones_collection.find_one({"userId":userId}):
-        timezones_collection.insert_one(doc)
+    result = timezones_collection.update_one(
+        {"userId": userId},
+        {"$set": {"timezone": timezone}},
+        upsert=True
+    )
+    _tz_cache.set(userId, (timezone, pytz.timezone(timezone)))
+    _bump_tz_version()
+    
+    if result.upserted_id:
         logger.debug(f"Created timezone document for user {userId}")
     else:
-        timezones_collection.update_one({"userId":userId},{"$set":{"timezone":timezone}})
         logger.debug(f"Updated timezone document for user {userId}")
+
+def cached_user_tz(userId):
+    """Get (timezone name, tzinfo) from the cache without any I/O, or None"""
+    return _tz_cache.get(userId)
+
+def resolve_user_tz(userId):
+    """Get (timezone name, tzinfo) for a user, loading it on a cache miss"""
+    entry = _tz_cache.get(userId)
+    if entry is None:
+        data = timezones_collection.find_one({"userId": userId}, {"timezone": 1})
+        if data:
+            entry = (data["timezone"], pytz.timezone(data["timezone"]))
+            _tz_cache.set(userId, entry)
+        else:
+            entry = ("-1", None)
+            _tz_cache.set(userId, entry, ttl=TZ_CACHE_NEGATIVE_TTL)
+    
+    return entry
         
 def get_user_tz(userId) -> str:
-    data = timezones_collection.find_one({"userId":userId})
-    
-    if data:
-        return data["timezone"]
-    else:
-        return "-1"
\ No newline at end of file
+    return resolve_user_tz(userId)[0]
+
+def tz_cache_stats():
+    return _tz_cache.stats()
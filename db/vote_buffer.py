@@ -0,0 +1,125 @@
+"""
+Write-behind buffer for poll votes
+
+Keeps the latest choice per user per poll in memory and persists them
+in bulk every flush interval or once enough votes are queued.
+"""
+import asyncio
+import logging
+from config import POLL_VOTE_FLUSH_INTERVAL_MS, POLL_VOTE_FLUSH_MAX_VOTES
+from . import aio
+
+logger = logging.getLogger(__name__)
+
+class VoteBuffer:
+    def __init__(self, flush_interval_ms=POLL_VOTE_FLUSH_INTERVAL_MS, max_votes=POLL_VOTE_FLUSH_MAX_VOTES):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_votes = max_votes
+        # Called as on_flush(poll_id, poll_data, context) with the persisted tally and latest context
+        self.on_flush = None
+        self._votes = {}  # poll id -> {user id: option}
+        self._flushing = {}  # the batch being written, same shape as _votes
+        self._contexts = {}  # poll id -> latest context passed to record()
+        self._size = 0
+        self._task = None
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+    
+    def __len__(self):
+        return self._size
+    
+    def has_pending(self, poll_id):
+        return bool(self._votes.get(poll_id))
+    
+    async def record(self, poll_id, user_id, option_index, context=None):
+        """Buffer a vote. Returns False if it repeats the user's buffered or persisted choice"""
+        option = str(option_index)
+        
+        if await self._current_choice(poll_id, user_id) == option:
+            return False
+        
+        votes = self._votes.setdefault(poll_id, {})
+        
+        if user_id not in votes:
+            self._size += 1
+        votes[user_id] = option
+        
+        if context is not None:
+            self._contexts[poll_id] = context
+        
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self._size >= self.max_votes:
+            self._wakeup.set()
+        
+        return True
+    
+    async def _current_choice(self, poll_id, user_id):
+        """The user's latest choice, buffered, being flushed or already persisted"""
+        for votes in (self._votes, self._flushing):
+            option = votes.get(poll_id, {}).get(user_id)
+            if option is not None:
+                return option
+        
+        return await aio.polls_ops.get_user_vote(poll_id, user_id)
+    
+    async def get_poll(self, poll_id):
+        """Get a poll whose counters include votes still in the buffer"""
+        # Holding the lock keeps a flush from landing between the two reads
+        async with self._flush_lock:
+            pending = dict(self._votes.get(poll_id, {}))
+            return await aio.polls_ops.get_poll_with_pending(poll_id, pending)
+    
+    async def flush(self):
+        """Persist every buffered vote with a single bulk write"""
+        async with self._flush_lock:
+            if not self._votes:
+                return
+            
+            batch, self._votes, self._size = self._votes, {}, 0
+            self._flushing = batch
+            contexts = {poll_id: self._contexts.pop(poll_id) for poll_id in batch if poll_id in self._contexts}
+            
+            try:
+                tallies = await aio.polls_ops.apply_vote_batch(batch)
+            except Exception as e:
+                logger.error(f"Failed to flush {sum(len(v) for v in batch.values())} buffered votes: {e}")
+                # Requeue unless the user voted again while we were writing
+                for poll_id, choices in batch.items():
+                    current = self._votes.setdefault(poll_id, {})
+                    for user_id, option in choices.items():
+                        if user_id not in current:
+                            current[user_id] = option
+                            self._size += 1
+                return
+            finally:
+                self._flushing = {}
+        
+        if self.on_flush:
+            for poll_id, poll_data in tallies.items():
+                self.on_flush(poll_id, poll_data, contexts.get(poll_id))
+    
+    async def drain(self):
+        """Stop the flush loop and write out everything still buffered"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+    
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Vote buffer flush loop error: {e}")
+
+vote_buffer = VoteBuffer()
@@ -0,0 +1,89 @@
+import discord
+import logging
+from config import LIST_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+class Paginator(discord.ui.View):
+    """
+    Prev/next browsing over a keyset-paginated query.
+
+    Only the cursor each visited page starts after is kept, every page is
+    one bounded range query no matter how many rows exist in total.
+
+    Args:
+        fetch_page: Coroutine function called as fetch_page(after, limit)
+            returning rows in order, where after is None for the first page.
+        cursor_of: Returns the cursor of a row, passed back as after.
+        format_page: Renders (rows, page_number) into message content.
+        owner_id: Only this user can turn the pages.
+    """
+    def __init__(self, fetch_page, cursor_of, format_page, owner_id, page_size=LIST_PAGE_SIZE, timeout=600):
+        super().__init__(timeout=timeout)
+        self.fetch_page = fetch_page
+        self.cursor_of = cursor_of
+        self.format_page = format_page
+        self.owner_id = owner_id
+        self.page_size = page_size
+        self.page = 0
+        self.rows = []
+        self._starts = [None]  # cursor each visited page starts after
+        self._has_next = False
+        self._interaction = None
+    
+    async def load(self):
+        # One extra row tells whether a next page exists without counting
+        rows = await self.fetch_page(self._starts[self.page], self.page_size + 1)
+        self._has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = not self._has_next
+    
+    def content(self):
+        return self.format_page(self.rows, self.page + 1)
+    
+    async def send(self, interaction: discord.Interaction, empty_message):
+        """Load the first page and send it, or empty_message if there are no rows"""
+        await self.load()
+        if not self.rows:
+            await interaction.response.send_message(empty_message, ephemeral=True)
+            return
+        
+        self._interaction = interaction
+        # A single page needs no buttons
+        view = self if self._has_next else discord.utils.MISSING
+        await interaction.response.send_message(self.content(), view=view, ephemeral=True)
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+    
+    async def on_timeout(self):
+        if self._interaction is None:
+            return
+        
+        for item in self.children:
+            item.disabled = True
+        try:
+            await self._interaction.edit_original_response(view=self)
+        except discord.HTTPException:
+            pass
+    
+    @discord.ui.button(label="Prev", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await self._show(interaction)
+    
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.page + 1 == len(self._starts):
+            self._starts.append(self.cursor_of(self.rows[-1]))
+        self.page += 1
+        await self._show(interaction)
+    
+    async def _show(self, interaction: discord.Interaction):
+        try:
+            await self.load()
+            await interaction.response.edit_message(content=self.content(), view=self)
+        except Exception as e:
+            logger.error(f"Failed to load page {self.page + 1}: {e}")
+            await interaction.response.send_message(f"Error loading page: {e}", ephemeral=True)
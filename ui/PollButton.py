@@ -1,69 +1,132 @@
 import discord
 import db
+import time
+from db.vote_buffer import vote_buffer
+from ui.PollRenderer import poll_cache, render_scheduler, build_results_embed
+from utils import metrics
+from config import POLL_VOTE_BUFFERING
 
-class PollButton(discord.ui.Button):
-    def __init__(self, label, option_index, emoji):
-        super().__init__(label=label, style=discord.ButtonStyle.primary, emoji=emoji)
+def _render_flushed(poll_id, poll_data, message):
+    """Re-render a poll message once its buffered votes are persisted"""
+    poll_cache.update(poll_data)
+    if message:
+        render_scheduler.request(message, poll_data)
+
+vote_buffer.on_flush = _render_flushed
+
+class PollButton(discord.ui.DynamicItem[discord.ui.Button], template=r"poll:(?P<poll_id>[0-9a-f]{24}):(?P<option>[0-9])"):
+    """
+    Vote button. The custom_id carries the poll and option, so clicks are
+    routed here after a restart without registering a view per poll.
+    """
+    def __init__(self, poll_id, option_index, label=None, emoji=None):
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=discord.ButtonStyle.primary,
+            emoji=emoji,
+            custom_id=f"poll:{poll_id}:{option_index}"
+        ))
+        self.poll_id = poll_id
         self.option_index = option_index
     
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["poll_id"], int(match["option"]))
+    
     async def callback(self, interaction: discord.Interaction):
+        with metrics.ui_callback_seconds.time(callback="poll_vote"):
+            await self._vote(interaction)
+    
+    async def _accepts_votes(self):
+        """Deadline check for buffered votes, answered from the cached tally when there is one"""
+        poll_data = poll_cache.get(self.poll_id)
+        if poll_data is None:
+            return await db.aio.polls_ops.poll_is_open(self.poll_id)
+        
+        expires_at = poll_data.get('expires_at')
+        return expires_at is None or expires_at > time.time()
+    
+    async def _vote(self, interaction: discord.Interaction):
         try:
-            poll_view = self.view
-            if not poll_view.poll_id:
-                await interaction.response.send_message("Poll ID not found.", ephemeral=True)
-                return
-            
-            from bson import ObjectId
             user_id = interaction.user.id
             
-            # Get current poll data
-            poll_data = db.dbmanager.polls_collection.find_one({"_id": ObjectId(poll_view.poll_id)})
+            if POLL_VOTE_BUFFERING:
+                if not await self._accepts_votes():
+                    await interaction.response.send_message("This poll has closed.", ephemeral=True)
+                    return
+                
+                if not await vote_buffer.record(self.poll_id, user_id, self.option_index, context=interaction.message):
+                    await interaction.response.send_message("You have already voted for this option!", ephemeral=True)
+                    return
+                
+                # The message is re-rendered after the buffer is flushed
+                metrics.votes_total.inc(mode="buffered")
+                await interaction.response.defer()
+                return
+            
+            # Record the vote (moves it from any other option)
+            status, poll_data = await db.aio.polls_ops.cast_vote(self.poll_id, self.option_index, user_id, interaction.guild_id)
             
-            if not poll_data:
+            if status == db.polls_ops.POLL_NOT_FOUND:
                 await interaction.response.send_message("Poll not found.", ephemeral=True)
                 return
             
-            # Check if user already voted for this option
-            current_votes = poll_data['votes'].get(str(self.option_index), [])
+            if status == db.polls_ops.POLL_CLOSED:
+                await interaction.response.send_message("This poll has closed.", ephemeral=True)
+                return
             
-            if user_id in current_votes:
+            if status == db.polls_ops.VOTE_UNCHANGED:
                 await interaction.response.send_message("You have already voted for this option!", ephemeral=True)
                 return
             
-            # Remove user's vote from other options (allow vote changing)
-            for option_idx in poll_data['votes']:
-                if user_id in poll_data['votes'][option_idx]:
-                    poll_data['votes'][option_idx].remove(user_id)
-            
-            # Add vote to selected option
-            if str(self.option_index) not in poll_data['votes']:
-                poll_data['votes'][str(self.option_index)] = []
-            poll_data['votes'][str(self.option_index)].append(user_id)
+            # Acknowledge right away, the message edit is coalesced with other votes
+            metrics.votes_total.inc(mode="direct")
+            await interaction.response.defer()
+            poll_cache.update(poll_data)
+            render_scheduler.request(interaction.message, poll_data)
             
-            # Update database
-            db.dbmanager.polls_collection.update_one(
-                {"_id": ObjectId(poll_view.poll_id)},
-                {"$set": {"votes": poll_data['votes']}}
-            )
-            
-            # Update the embed
-            embed = discord.Embed(
-                title=f"📊 {poll_data['question']}",
-                description="Click the buttons below to vote!",
-                color=discord.Color.blue()
-            )
-            
-            for i, option in enumerate(poll_data['options']):
-                vote_count = len(poll_data['votes'].get(str(i), []))
-                embed.add_field(
-                    name=f"{i+1}️⃣ {option}",
-                    value=f"{vote_count} votes",
-                    inline=False
-                )
-            
-            embed.set_footer(text=f"Poll created by {interaction.guild.get_member(poll_data['creator_id']).display_name if interaction.guild.get_member(poll_data['creator_id']) else 'Unknown'}")
+        except Exception as e:
+            # Once the click is deferred, errors can only be sent as a followup
+            if interaction.response.is_done():
+                await interaction.followup.send(f"Error voting: {e}", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"Error voting: {e}", ephemeral=True)
+
+class PollResultsButton(discord.ui.DynamicItem[discord.ui.Button], template=r"poll:(?P<poll_id>[0-9a-f]{24}):results"):
+    """Show Results button, persistent the same way as PollButton"""
+    def __init__(self, poll_id):
+        super().__init__(discord.ui.Button(
+            label="Show Results",
+            style=discord.ButtonStyle.secondary,
+            emoji="📊",
+            custom_id=f"poll:{poll_id}:results"
+        ))
+        self.poll_id = poll_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["poll_id"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        with metrics.ui_callback_seconds.time(callback="poll_results"):
+            await self._show_results(interaction)
+    
+    async def _show_results(self, interaction: discord.Interaction):
+        try:
+            if POLL_VOTE_BUFFERING and vote_buffer.has_pending(self.poll_id):
+                # Unflushed votes aren't part of any snapshot, render them without caching
+                poll_data = await vote_buffer.get_poll(self.poll_id)
+                if poll_data:
+                    await interaction.response.send_message(embed=build_results_embed(poll_data), ephemeral=True)
+                    return
+            else:
+                # An unchanged poll is answered from its snapshot without touching the database
+                poll_data = poll_cache.get(self.poll_id) or await db.aio.polls_ops.get_poll_by_id(self.poll_id)
+                if poll_data:
+                    await interaction.response.send_message(embed=poll_cache.results_embed(poll_data), ephemeral=True)
+                    return
             
-            await interaction.response.edit_message(embed=embed, view=poll_view)
+            await interaction.response.send_message("Poll not found.", ephemeral=True)
             
         except Exception as e:
-            await interaction.response.send_message(f"Error voting: {e}", ephemeral=True)
+            await interaction.response.send_message(f"Error showing results: {e}", ephemeral=True)
@@ -0,0 +1,204 @@
+import asyncio
+import discord
+import logging
+from utils.cache import LRUCache
+from config import POLL_RENDER_INTERVAL, POLL_CACHE_SIZE, POLL_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# (guild id, creator id) -> display name, only names that resolved are kept
+_creator_names = LRUCache(maxsize=POLL_CACHE_SIZE, ttl=POLL_CACHE_TTL)
+
+def creator_name(guild, creator_id):
+    if guild is None:
+        return "Unknown"
+    
+    name = _creator_names.get((guild.id, creator_id))
+    if name is None:
+        creator = guild.get_member(creator_id)
+        if creator is None:
+            return "Unknown"
+        name = creator.display_name
+        _creator_names.set((guild.id, creator_id), name)
+    
+    return name
+
+def poll_description(expires_at=None):
+    if expires_at:
+        return f"Click the buttons below to vote! Closes <t:{int(expires_at)}:R>"
+    return "Click the buttons below to vote!"
+
+def build_poll_embed(poll_data, guild):
+    """Build the live vote-count embed shown on the poll message"""
+    embed = discord.Embed(
+        title=f"📊 {poll_data['question']}",
+        description=poll_description(poll_data.get('expires_at')),
+        color=discord.Color.blue()
+    )
+    
+    for i, option in enumerate(poll_data['options']):
+        vote_count = poll_data['counts'].get(str(i), 0)
+        embed.add_field(
+            name=f"{i+1}️⃣ {option}",
+            value=f"{vote_count} votes",
+            inline=False
+        )
+    
+    embed.set_footer(text=f"Poll created by {creator_name(guild, poll_data['creator_id'])}")
+    
+    return embed
+
+def build_results_embed(poll_data, description=None):
+    """Build the results embed with a progress bar per option"""
+    embed = discord.Embed(
+        title=f"📊 {poll_data['question']} - Results",
+        description=description,
+        color=discord.Color.green()
+    )
+    
+    total_votes = poll_data.get('total_votes', 0)
+    
+    for i, option in enumerate(poll_data['options']):
+        vote_count = poll_data['counts'].get(str(i), 0)
+        percentage = (vote_count / total_votes * 100) if total_votes > 0 else 0
+        
+        bar = "█" * int(percentage // 5) + "░" * (20 - int(percentage // 5))
+        
+        embed.add_field(
+            name=f"{i+1}️⃣ {option}",
+            value=f"{bar} {vote_count} votes ({percentage:.1f}%)",
+            inline=False
+        )
+    
+    embed.set_footer(text=f"Total votes: {total_votes}")
+    
+    return embed
+
+class PollCache:
+    """
+    Latest tally snapshot per poll together with its rendered embeds.
+
+    A snapshot is only replaced by a tally with a higher version, and its
+    embeds are dropped with it, so a cached embed always renders the cached
+    tally. Every interaction for a guild arrives on the shard that owns it,
+    so the votes on the polls this process serves pass through here.
+    """
+    def __init__(self, maxsize=POLL_CACHE_SIZE, ttl=POLL_CACHE_TTL):
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl)  # poll id -> {"poll": poll_data, "embeds": {kind: embed}}
+        self.renders = 0
+    
+    def get(self, poll_id):
+        """Get the latest known tally of a poll, or None"""
+        entry = self._entries.get(poll_id)
+        return entry["poll"] if entry else None
+    
+    def update(self, poll_data):
+        """Store a tally unless a newer one is already cached"""
+        poll_id = str(poll_data["_id"])
+        entry = self._entries.get(poll_id, count=False)
+        if entry and entry["poll"].get("version", 0) >= poll_data.get("version", 0):
+            return
+        
+        self._entries.set(poll_id, {"poll": poll_data, "embeds": {}})
+    
+    def discard(self, poll_id):
+        self._entries.pop(poll_id)
+    
+    def poll_embed(self, poll_data, guild):
+        return self._render(poll_data, "poll", lambda: build_poll_embed(poll_data, guild))
+    
+    def results_embed(self, poll_data):
+        return self._render(poll_data, "results", lambda: build_results_embed(poll_data))
+    
+    def _render(self, poll_data, kind, build):
+        self.update(poll_data)
+        entry = self._entries.get(str(poll_data["_id"]), count=False)
+        
+        # An older tally than the snapshot is rendered but never cached
+        if entry is None or entry["poll"].get("version", 0) != poll_data.get("version", 0):
+            return build()
+        
+        embed = entry["embeds"].get(kind)
+        if embed is None:
+            embed = entry["embeds"][kind] = build()
+            self.renders += 1
+        return embed
+    
+    def stats(self):
+        return {**self._entries.stats(), "renders": self.renders}
+
+class PollRenderScheduler:
+    """
+    Coalesces poll message edits under vote bursts.
+
+    The first update for a message is applied right away, later ones are
+    folded into at most one edit per interval that always carries the
+    newest tally. A tally older than the one already on the message is
+    dropped, since cast_vote results can come back out of order.
+    """
+    def __init__(self, interval=POLL_RENDER_INTERVAL):
+        self.interval = interval
+        self.requested = 0
+        self.edits = 0
+        self._pending = {}  # message id -> (message, poll_data)
+        self._tasks = {}  # message id -> edit task
+        self._rendered = LRUCache(maxsize=POLL_CACHE_SIZE, ttl=POLL_CACHE_TTL)  # message id -> version on the message
+    
+    @property
+    def edits_saved(self):
+        return self.requested - self.edits
+    
+    def stats(self):
+        return {
+            "requested": self.requested,
+            "edits": self.edits,
+            "edits_saved": self.edits_saved,
+            "pending": len(self._pending)
+        }
+    
+    def request(self, message, poll_data):
+        """Queue a re-render of a poll message with the given tally"""
+        self.requested += 1
+        
+        # Out-of-order results must not replace a newer tally, queued or already shown
+        version = poll_data.get('version', 0)
+        queued = self._pending.get(message.id)
+        if queued and queued[1].get('version', 0) > version:
+            return
+        if self._rendered.get(message.id, 0, count=False) > version:
+            return
+        
+        self._pending[message.id] = (message, poll_data)
+        if message.id not in self._tasks:
+            self._tasks[message.id] = asyncio.create_task(self._run(message.id))
+    
+    def discard(self, message_id):
+        """Drop pending edits of a message and ignore later ones, once it shows its final state"""
+        self._rendered.set(message_id, float("inf"))
+        self._pending.pop(message_id, None)
+        task = self._tasks.pop(message_id, None)
+        if task:
+            task.cancel()
+    
+    async def _run(self, message_id):
+        try:
+            while message_id in self._pending:
+                message, poll_data = self._pending.pop(message_id)
+                version = poll_data.get('version', 0)
+                # A newer tally may have been applied while this one waited
+                if self._rendered.get(message_id, 0, count=False) > version:
+                    continue
+                try:
+                    # Components are left untouched, the persistent buttons never change
+                    await message.edit(embed=poll_cache.poll_embed(poll_data, message.guild))
+                    self.edits += 1
+                    self._rendered.set(message_id, version)
+                except Exception as e:
+                    logger.error(f"Failed to re-render poll message {message_id}: {e}")
+                
+                await asyncio.sleep(self.interval)
+        finally:
+            self._tasks.pop(message_id, None)
+
+poll_cache = PollCache()
+render_scheduler = PollRenderScheduler()
@@ -1,67 +1,265 @@
 """
 Bot utilities and initialization functions
 """
+import asyncio
 import discord
+import hashlib
+import json
 import logging
+import time
+from discord import app_commands
 from discord.ext import commands
-from config import COGS, GUILD_ID
+from config import (
+    COGS, SHARD_COUNT, SHARD_IDS, COMMAND_SYNC_FORCE, COMMAND_SYNC_CONCURRENCY, METRICS_ENABLED, METRICS_HOST, METRICS_PORT,
+    WATCHDOG_ENABLED, WATCHDOG_INTERVAL, WATCHDOG_STALL_THRESHOLD, WATCHDOG_REPORT_INTERVAL
+)
 from utils.scheduler_utils import set_bot_instance, initialize_scheduler
+from utils import metrics, log_pipeline
+from utils.watchdog import LoopWatchdog
+from utils.guilds import sync_targets
+from utils.cluster import ProcessHeartbeat, PROCESS_ID
+from db.vote_buffer import vote_buffer
+import db
 
 logger = logging.getLogger(__name__)
 
 def setup_logging():
     """Configure logging for the bot"""
-    from config import LOG_LEVEL, LOG_FORMAT, LOG_FILE
+    from config import (
+        LOG_LEVEL, LOG_FORMAT, LOG_FILE, LOG_ROTATION, LOG_MAX_BYTES, LOG_BACKUP_COUNT,
+        LOG_ROTATION_WHEN, LOG_JSON, LOG_LEVELS, LOG_QUEUE_SIZE
+    )
     
-    logging.basicConfig(
+    log_pipeline.start(
         level=getattr(logging, LOG_LEVEL),
-        format=LOG_FORMAT,
-        handlers=[
-            logging.FileHandler(LOG_FILE),
-            logging.StreamHandler()
-        ]
+        fmt=LOG_FORMAT,
+        path=LOG_FILE,
+        rotation=LOG_ROTATION,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        when=LOG_ROTATION_WHEN,
+        json_output=LOG_JSON,
+        levels=LOG_LEVELS,
+        queue_size=LOG_QUEUE_SIZE
     )
 
+def _observe_command(interaction, status):
+    started_at = interaction.extras.get("started_at")
+    if started_at is None:
+        return
+    
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    metrics.slash_command_seconds.observe(time.perf_counter() - started_at, command=name, status=status)
+
+class TheseusCommandTree(app_commands.CommandTree):
+    """Command tree that times every slash command it dispatches"""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        return True
+    
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        _observe_command(interaction, "error")
+        await super().on_error(interaction, error)
+
+class TheseusBot(commands.AutoShardedBot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.ready_at = None
+    
+    async def setup_hook(self):
+        """One-time initialization, runs once after login and before the gateway connects"""
+        await initialize_bot_components(self)
+    
+    async def on_ready(self):
+        if self.ready_at is not None:
+            logger.info(f"Gateway session resumed as {self.user}")
+            return
+        
+        self.ready_at = time.monotonic()
+        time_to_ready = self.ready_at - self.created_at
+        metrics.startup_seconds.set(time_to_ready)
+        logger.info(f"Bot ready as {self.user} in {time_to_ready:.2f}s")
+    
+    async def on_shard_ready(self, shard_id):
+        logger.info(f"Shard {shard_id} ready")
+    
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        _observe_command(interaction, "ok")
+    
+    async def close(self):
+        """Flush buffered state before disconnecting"""
+        try:
+            await vote_buffer.drain()
+        except Exception as e:
+            logger.error(f"Failed to drain vote buffer on shutdown: {e}")
+        
+        if hasattr(self, 'scheduler'):
+            await self.scheduler.shutdown()
+        
+        if hasattr(self, 'heartbeat'):
+            await self.heartbeat.stop()
+        
+        if hasattr(self, 'watchdog'):
+            self.watchdog.stop()
+        
+        if hasattr(self, 'metrics_runner'):
+            await self.metrics_runner.cleanup()
+        
+        await super().close()
+
 def create_bot():
     """Create and configure the bot instance"""
     from config import COMMAND_PREFIX
     
     intents = discord.Intents.default()
     intents.message_content = True
-    bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+    bot = TheseusBot(
+        command_prefix=COMMAND_PREFIX,
+        intents=intents,
+        tree_cls=TheseusCommandTree,
+        shard_count=SHARD_COUNT,
+        shard_ids=SHARD_IDS
+    )
     
     return bot
 
 async def load_cogs(bot):
-    """Load all cogs"""
+    """Load all cogs concurrently so their database setup overlaps"""
+    results = await asyncio.gather(*(bot.load_extension(cog) for cog in COGS), return_exceptions=True)
+    
+    failed = 0
+    for cog, result in zip(COGS, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logger.error(f"Failed to load cog {cog}: {result}")
+    
+    if not failed:
+        logger.info("All cogs loaded successfully")
+
+def command_tree_fingerprint(bot, guild):
+    """Hash of the command payloads Discord would receive for this guild, or the global tree for None"""
+    payload = sorted(
+        (command.to_dict(bot.tree) for command in bot.tree.get_commands(guild=guild)),
+        key=lambda command: (command.get("type", 1), command["name"])
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _sync_scope(guild):
+    return guild.id if guild else "global"
+
+async def sync_commands(bot):
+    """Sync slash commands to every target whose command tree changed since its last sync"""
+    targets = sync_targets()
     try:
-        for cog in COGS:
-            await bot.load_extension(cog)
+        synced_fingerprints = await db.aio.meta_ops.get_command_tree_hashes(bot.application_id, [_sync_scope(guild) for guild in targets])
+    except Exception as e:
+        logger.error(f"Failed to read command tree fingerprints, syncing everything: {e}")
+        synced_fingerprints = {}
+    
+    semaphore = asyncio.Semaphore(COMMAND_SYNC_CONCURRENCY)
+    
+    async def sync_one(guild):
+        scope = _sync_scope(guild)
+        fingerprint = command_tree_fingerprint(bot, guild)
+        if fingerprint == synced_fingerprints.get(scope) and not COMMAND_SYNC_FORCE:
+            return "unchanged"
         
-        logger.info("All cogs loaded successfully")
+        async with semaphore:
+            try:
+                await bot.tree.sync(guild=guild)
+                await db.aio.meta_ops.set_command_tree_hash(bot.application_id, scope, fingerprint)
+                return "synced"
+            except Exception as e:
+                logger.error(f"Failed to sync commands for {scope}: {e}")
+                return "failed"
+    
+    results = await asyncio.gather(*(sync_one(guild) for guild in targets))
+    logger.info(
+        f"Command sync: {results.count('synced')} synced, {results.count('unchanged')} unchanged, "
+        f"{results.count('failed')} failed across {len(targets)} targets"
+    )
+
+async def ensure_unique_indexes(bot):
+    """Create the unique indexes before cogs start writing, repeat votes and duplicate names depend on them"""
+    try:
+        await db.aio.run(db.dbmanager.ensure_unique_indexes)
+        logger.info("Unique database indexes ensured")
     except Exception as e:
-        logger.error(f"Failed to load cog: {e}")
+        logger.error(f"Failed to ensure unique indexes: {e}")
 
-async def sync_commands(bot):
-    """Sync slash commands to guild"""
+async def ensure_indexes(bot):
+    """Create query indexes off the startup path, they are idempotent and rarely change"""
+    try:
+        await db.aio.run(db.dbmanager.ensure_indexes)
+        logger.info("Database indexes ensured")
+    except Exception as e:
+        logger.error(f"Failed to ensure indexes: {e}")
+
+async def start_metrics(bot):
+    """Serve the Prometheus endpoint unless disabled in config"""
+    if not METRICS_ENABLED or hasattr(bot, 'metrics_runner'):
+        return
+    
+    try:
+        bot.metrics_runner = await metrics.start_server(METRICS_HOST, METRICS_PORT)
+    except Exception as e:
+        logger.error(f"Failed to start metrics endpoint: {e}")
+
+async def join_cluster(bot):
+    """
+    Register this process with a first heartbeat. Must finish before the
+    scheduler can claim reminders, or a peer would see the claims of an
+    unknown process, release them as dead and deliver them a second time.
+    """
+    if hasattr(bot, 'heartbeat'):
+        return
+    
+    bot.heartbeat = ProcessHeartbeat(bot)
     try:
-        synced = await bot.tree.sync(guild=discord.Object(GUILD_ID))
-        logger.info(f"Successfully synced {len(synced)} slash commands")
+        await bot.heartbeat.register()
     except Exception as e:
-        logger.error(f"Failed to sync commands: {e}")
+        logger.error(f"Failed to register process {PROCESS_ID}: {e}")
+    logger.info(f"Running as process {PROCESS_ID} (shards {bot.shard_ids or 'all'})")
+
+def start_heartbeat(bot):
+    """Keep heartbeating so reminder claims of this process can be taken over if it dies"""
+    bot.heartbeat.start()
+
+def start_watchdog(bot):
+    """Start the event loop lag watchdog unless disabled in config"""
+    if not WATCHDOG_ENABLED or hasattr(bot, 'watchdog'):
+        return
+    
+    bot.watchdog = LoopWatchdog(WATCHDOG_INTERVAL, WATCHDOG_STALL_THRESHOLD, WATCHDOG_REPORT_INTERVAL)
+    bot.watchdog.start()
 
 async def initialize_bot_components(bot):
-    """Initialize all bot components on ready"""
+    """Initialize all bot components, called once from setup_hook"""
+    started = time.monotonic()
     logger.info(f"Bot logged in as {bot.user}")
     
     # Set bot instance for scheduler utils
     set_bot_instance(bot)
     
+    # Duplicate rejection must be in place before any traffic, the rest only speeds up
+    # queries and can take a while on large collections, so it isn't waited for
+    await ensure_unique_indexes(bot)
+    bot.index_task = asyncio.create_task(ensure_indexes(bot))
+    
     # Load cogs
     await load_cogs(bot)
     
     # Sync commands
     await sync_commands(bot)
     
-    # Initialize scheduler
+    # Expose metrics and watch for loop stalls
+    await start_metrics(bot)
+    start_watchdog(bot)
+    
+    # Join the cluster before the scheduler claims anything
+    await join_cluster(bot)
     await initialize_scheduler(bot)
+    start_heartbeat(bot)
+    
+    logger.info(f"Bot components initialized in {time.monotonic() - started:.2f}s")
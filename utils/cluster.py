@@ -0,0 +1,90 @@
+"""
+Process membership for running the bot as several processes
+
+Every process heartbeats into MongoDB. Reminders are fired through a
+lease (claimed_by/claim_expires on the reminder document), so when a
+process stops heartbeating its leases are ended early and the reminders
+it was delivering are picked up by the processes still alive.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+import db
+from config import PROCESS_HEARTBEAT_INTERVAL, PROCESS_DEAD_AFTER, REMINDER_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in heartbeats and reminder claims
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class ProcessHeartbeat:
+    def __init__(self, bot, interval=PROCESS_HEARTBEAT_INTERVAL, dead_after=PROCESS_DEAD_AFTER):
+        self.bot = bot
+        self.interval = interval
+        self.dead_after = dead_after
+        self.started_at = datetime.now(timezone.utc)
+        self.taken_over = 0
+        self._task = None
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        
+        # Leave right away instead of waiting to be declared dead
+        try:
+            await db.aio.cluster_ops.deregister(PROCESS_ID)
+        except Exception as e:
+            logger.error(f"Failed to deregister process {PROCESS_ID}: {e}")
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.beat()
+            except Exception as e:
+                logger.error(f"Process heartbeat failed: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def register(self):
+        """Write the first heartbeat, so peers see this process as live before it claims anything"""
+        await db.aio.cluster_ops.heartbeat(PROCESS_ID, getattr(self.bot, 'shard_ids', None), self.started_at)
+    
+    async def beat(self):
+        await self.register()
+        
+        live = await db.aio.cluster_ops.live_process_ids(self.dead_after)
+        released = await db.aio.cluster_ops.expire_dead_claims(live)
+        if released:
+            logger.warning(f"Released {released} reminder claims held by dead processes")
+        
+        await self.take_over_orphans()
+    
+    async def take_over_orphans(self):
+        """Fire reminders whose claim lapsed before the claiming process finished delivering them"""
+        scheduler = getattr(self.bot, 'scheduler', None)
+        if scheduler is None:
+            return
+        
+        orphans = await db.aio.reminder_ops.get_orphaned_reminders(time.time(), REMINDER_PAGE_SIZE)
+        now = time.time()
+        for reminder in orphans:
+            # Every live process schedules them, the claim lets only one deliver
+            scheduler.add_job(
+                now,
+                reminder.get("userId"),
+                reminder.get("title", "Reminder"),
+                reminder.get("desc", ""),
+                job_id=reminder["job_id"]
+            )
+        
+        if orphans:
+            self.taken_over += len(orphans)
+            logger.info(f"Scheduled {len(orphans)} orphaned reminders for takeover")
@@ -0,0 +1,55 @@
+"""
+Cached resolution of users and their DM channels
+
+Reminder delivery goes through here so the critical path is a single
+message POST once a user's DM channel is known. Reminders due soon are
+pre-warmed so the lookups happen before the due time.
+"""
+import asyncio
+import logging
+from utils.cache import LRUCache
+from config import DM_CACHE_SIZE, DM_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# user id -> open DMChannel (its recipient is the resolved user)
+_dm_channels = LRUCache(maxsize=DM_CACHE_SIZE, ttl=DM_CACHE_TTL)
+# user id -> in-flight resolution, so concurrent lookups share one REST call
+_pending = {}
+
+async def _resolve(bot, user_id):
+    user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+    channel = user.dm_channel or await user.create_dm()
+    _dm_channels.set(user_id, channel)
+    
+    return channel
+
+async def get_dm_channel(bot, user_id):
+    """Get the DM channel for a user, resolving and caching it on a miss"""
+    channel = _dm_channels.get(user_id)
+    if channel is not None:
+        return channel
+    
+    task = _pending.get(user_id)
+    if task is None:
+        task = asyncio.ensure_future(_resolve(bot, user_id))
+        _pending[user_id] = task
+        task.add_done_callback(lambda _: _pending.pop(user_id, None))
+    
+    return await asyncio.shield(task)
+
+async def prewarm(bot, user_id):
+    """Resolve a user's DM channel ahead of a delivery"""
+    if user_id in _dm_channels:
+        return
+    
+    try:
+        await get_dm_channel(bot, user_id)
+    except Exception as e:
+        logger.debug(f"Failed to pre-warm DM channel for user {user_id}: {e}")
+
+def invalidate(user_id):
+    _dm_channels.pop(user_id)
+
+def stats():
+    return _dm_channels.stats()
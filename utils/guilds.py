@@ -0,0 +1,12 @@
+"""
+Guild scoping helpers shared by the cogs
+"""
+import discord
+from config import GUILD_IDS
+
+# Pass as guilds= when registering commands. MISSING registers them globally
+COMMAND_GUILDS = [discord.Object(guild_id) for guild_id in GUILD_IDS] or discord.utils.MISSING
+
+def sync_targets():
+    """Guilds whose command trees need syncing, [None] for the global tree"""
+    return list(COMMAND_GUILDS) if COMMAND_GUILDS else [None]
@@ -0,0 +1,89 @@
+"""
+Non-blocking logging pipeline
+
+Loggers only put records on a bounded in-memory queue. A background
+QueueListener thread does the formatting and disk I/O, so a slow disk
+never stalls the event loop. If the queue is full, records are dropped
+and counted rather than blocking the caller.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from utils import metrics
+
+records_dropped = metrics.Counter("theseus_log_records_dropped_total", "Log records dropped because the log queue was full")
+
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        
+        return json.dumps(payload, ensure_ascii=False)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc()
+
+def _file_handler(path, rotation, max_bytes, backup_count, when):
+    if rotation == "time":
+        return logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count, encoding="utf-8")
+    
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+
+def start(level, fmt, path, rotation="size", max_bytes=10 * 1024 * 1024, backup_count=5,
+          when="midnight", json_output=False, levels=None, queue_size=10000):
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Args:
+        rotation: "size" rotates at max_bytes, "time" rotates on the `when` schedule.
+        levels: Per-logger level overrides, e.g. {"discord": "WARNING"}.
+    """
+    global _listener
+    
+    if _listener is not None:
+        return _listener
+    
+    formatter = JsonFormatter() if json_output else logging.Formatter(fmt)
+    handlers = [_file_handler(path, rotation, max_bytes, backup_count, when), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(maxsize=queue_size)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+    
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+    
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop)
+    
+    return _listener
+
+def stop():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,187 @@
+"""
+In-process metrics with a Prometheus text endpoint
+
+Metrics are plain objects registered at import time. Values may be
+updated from any thread (pymongo listeners run on the database executor)
+and are rendered in the Prometheus text exposition format by the local
+HTTP endpoint started with start_server().
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+    
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+    
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+    
+    def _samples(self):
+        with self._lock:
+            return [(self.name + self._labels(key), value) for key, value in self._values.items()]
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{sample} {_format_number(value)}" for sample, value in self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+    
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+    
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def set_function(self, function):
+        """Read the value from function() at render time instead of storing it"""
+        self._function = function
+    
+    def _samples(self):
+        if self._function is None:
+            return super()._samples()
+        
+        try:
+            return [(self.name, self._function())]
+        except Exception:
+            return []
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket{self._labels(key, [('le', _format_number(bound))])}", cumulative))
+                samples.append((f"{self.name}_sum{self._labels(key)}", total))
+                samples.append((f"{self.name}_count{self._labels(key)}", count))
+        return samples
+
+def render():
+    """All registered metrics in Prometheus text format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+# Bot metrics
+slash_command_seconds = Histogram("theseus_slash_command_seconds", "Slash command handling latency", ["command", "status"])
+ui_callback_seconds = Histogram("theseus_ui_callback_seconds", "UI component callback latency", ["callback"])
+mongo_command_seconds = Histogram("theseus_mongo_command_seconds", "MongoDB operation latency", ["collection", "command", "status"])
+scheduler_queue_depth = Gauge("theseus_scheduler_queue_depth", "Reminders queued in the in-memory window")
+reminder_fire_lag_seconds = Histogram(
+    "theseus_reminder_fire_lag_seconds", "Delay between a reminder's scheduled time and its delivery",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60, 300)
+)
+loop_lag_seconds = Gauge("theseus_loop_lag_seconds", "Most recent event loop scheduling delay")
+loop_lag_histogram = Histogram(
+    "theseus_loop_lag_distribution_seconds", "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+loop_stalls_total = Counter("theseus_loop_stalls_total", "Event loop stalls longer than the watchdog threshold")
+votes_total = Counter("theseus_votes_total", "Poll votes handled", ["mode"])
+startup_seconds = Gauge("theseus_startup_seconds", "Seconds from bot creation to the first ready event")
+custom_commands_total = Counter("theseus_custom_commands_total", "Custom command messages handled", ["result"])
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener feeding mongo_command_seconds"""
+    def __init__(self):
+        self._collections = {}  # request id -> collection name
+    
+    def started(self, event):
+        # Most commands name their collection under the command name, getMore uses "collection"
+        collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+    
+    def _finish(self, event, status):
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_seconds.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name, status=status)
+    
+    def succeeded(self, event):
+        self._finish(event, "ok")
+    
+    def failed(self, event):
+        self._finish(event, "error")
+
+async def _handle_metrics(request):
+    return web.Response(text=render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+async def start_server(host, port):
+    """Serve /metrics on host:port. Returns the runner to clean up on shutdown"""
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    
+    return runner
@@ -0,0 +1,51 @@
+"""
+Sampling profiler for the running process
+
+A background thread snapshots every other thread's stack at a fixed
+interval and counts collapsed stacks, which is the input format of
+flamegraph.pl and speedscope. Nothing runs unless a profile is active.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from utils.watchdog import collapse_stack
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()  # "thread;frame;frame..." -> samples
+        self.sample_count = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.stopped_at = time.monotonic()
+    
+    def collapsed(self):
+        """Collapsed stack output, one 'stack count' line per unique stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+    
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.samples[f"{names.get(thread_id, thread_id)};{collapse_stack(frame)}"] += 1
+            self.sample_count += 1
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    Async token bucket rate limiter.
+
+    Refills `rate` tokens per second up to `capacity`; acquire() waits
+    until a token is available. Waiters are served in arrival order.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            
+            self._tokens -= 1
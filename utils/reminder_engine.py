@@ -0,0 +1,230 @@
+"""
+Asyncio-native reminder scheduler
+
+Jobs are kept in a min-heap keyed by due timestamp and fired from a
+single task on the bot's event loop. Deliveries run as tasks bounded by
+a semaphore, so a burst of reminders due in the same second never waits
+on a thread pool.
+
+Only jobs due before the lookahead horizon are held in memory. A window
+task periodically pushes the horizon forward and asks the loader to page
+in the reminders that became due within it.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class ReminderJob:
+    __slots__ = ("id", "run_at", "user_id", "title", "description", "misfire_grace_time", "seq")
+    
+    def __init__(self, job_id, run_at, user_id, title, description, misfire_grace_time, seq):
+        self.id = job_id
+        self.run_at = run_at
+        self.user_id = user_id
+        self.title = title
+        self.description = description
+        self.misfire_grace_time = misfire_grace_time
+        self.seq = seq
+
+class ReminderEngine:
+    def __init__(self, deliver, max_concurrency, misfire_grace_time, coalesce=True,
+                 load_window=None, lookahead=600, window_refresh_interval=60,
+                 prewarm=None, prewarm_lead=60):
+        """
+        Args:
+            deliver: Coroutine function called with a ReminderJob when it fires.
+            max_concurrency: Maximum number of deliveries in flight.
+            misfire_grace_time: Seconds a job may run late before it is skipped.
+            coalesce: Re-adding a pending job ID replaces it instead of queueing a second run.
+            load_window: Coroutine function called as load_window(engine, start, end)
+                that adds every job due in [start, end). None keeps all jobs in memory.
+            lookahead: Seconds ahead of now the in-memory window reaches.
+            window_refresh_interval: Seconds between window advances.
+            prewarm: Coroutine function called with a ReminderJob prewarm_lead
+                seconds before it is due, to resolve anything delivery needs.
+        """
+        self._deliver = deliver
+        self._load_window = load_window
+        self.lookahead = lookahead
+        self.window_refresh_interval = window_refresh_interval
+        # Jobs due before the horizon are in memory, later ones only in storage
+        self.horizon = 0 if load_window else float("inf")
+        self._window_task = None
+        self._prewarm = prewarm
+        self.prewarm_lead = prewarm_lead
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.misfire_grace_time = misfire_grace_time
+        self.coalesce = coalesce
+        self._heap = []  # (run_at, seq, job_id), stale entries are skipped when popped
+        self._jobs = {}  # job id -> pending ReminderJob
+        self._running_ids = set()
+        self._inflight = set()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.fired = 0
+        self.misfired = 0
+    
+    @property
+    def queue_depth(self):
+        return len(self._jobs)
+    
+    @property
+    def inflight(self):
+        return len(self._inflight)
+    
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+    
+    def add_job(self, run_at, user_id, title, description, job_id=None, misfire_grace_time=None):
+        """Schedule a reminder at a UTC unix timestamp and return its job ID"""
+        job_id = job_id or uuid.uuid4().hex
+        
+        if job_id in self._jobs and not self.coalesce:
+            raise ValueError(f"Job {job_id} is already scheduled")
+        
+        job = ReminderJob(
+            job_id, run_at, user_id, title, description,
+            misfire_grace_time if misfire_grace_time is not None else self.misfire_grace_time,
+            next(self._seq)
+        )
+        self._jobs[job_id] = job
+        heapq.heappush(self._heap, (run_at, job.seq, job_id))
+        
+        # Wake the loop if this job is now the earliest one
+        if self._heap[0][1] == job.seq:
+            self._wakeup.set()
+        
+        if self._prewarm:
+            delay = max(0, run_at - self.prewarm_lead - time.time())
+            asyncio.get_running_loop().call_later(delay, self._start_prewarm, job_id, job.seq)
+        
+        return job_id
+    
+    def remove_job(self, job_id):
+        if self._jobs.pop(job_id, None) is None:
+            raise KeyError(f"No job by the id of {job_id} was found")
+    
+    def in_window(self, run_at):
+        """True if a job due at run_at belongs in memory now"""
+        return run_at < self.horizon
+    
+    async def advance_window(self):
+        """Move the horizon forward and load the jobs that entered the window"""
+        start = self.horizon
+        end = int(time.time()) + self.lookahead
+        if end <= start:
+            return
+        
+        # Raise the horizon before loading so jobs created meanwhile are added directly
+        self.horizon = end
+        try:
+            await self._load_window(self, start, end)
+        except Exception:
+            # Retry the same slice next time, re-added jobs coalesce
+            if self.horizon == end:
+                self.horizon = start
+            raise
+    
+    def get_job(self, job_id):
+        return self._jobs.get(job_id)
+    
+    def get_jobs(self):
+        return list(self._jobs.values())
+    
+    async def start(self):
+        if self.running:
+            return
+        
+        if self._load_window:
+            await self.advance_window()
+            self._window_task = asyncio.create_task(self._run_window())
+        self._task = asyncio.create_task(self._run())
+    
+    async def shutdown(self, timeout=10):
+        """Stop firing and wait for in-flight deliveries to finish"""
+        if self._window_task:
+            self._window_task.cancel()
+            self._window_task = None
+        
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        if self._inflight:
+            await asyncio.wait(self._inflight, timeout=timeout)
+    
+    async def _run(self):
+        while True:
+            now = time.time()
+            
+            while self._heap and self._heap[0][0] <= now:
+                run_at, seq, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                
+                # Cancelled or replaced since this entry was pushed
+                if job is None or job.seq != seq:
+                    continue
+                
+                del self._jobs[job_id]
+                self._dispatch(job, now)
+            
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _run_window(self):
+        while True:
+            await asyncio.sleep(self.window_refresh_interval)
+            try:
+                await self.advance_window()
+            except Exception as e:
+                logger.error(f"Failed to advance reminder window: {e}")
+    
+    def _start_prewarm(self, job_id, seq):
+        job = self._jobs.get(job_id)
+        if job is None or job.seq != seq:
+            return
+        
+        task = asyncio.create_task(self._prewarm(job))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+    
+    def _dispatch(self, job, now):
+        lateness = now - job.run_at
+        if lateness > job.misfire_grace_time:
+            self.misfired += 1
+            logger.warning(f"Run time of job {job.id} was missed by {lateness:.0f}s, skipping")
+            return
+        
+        if job.id in self._running_ids:
+            logger.warning(f"Job {job.id} is already running, skipping")
+            return
+        
+        self._running_ids.add(job.id)
+        task = asyncio.create_task(self._execute(job))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+    
+    async def _execute(self, job):
+        try:
+            async with self._semaphore:
+                await self._deliver(job)
+                self.fired += 1
+        except Exception as e:
+            logger.error(f"Job {job.id} raised an exception: {e}")
+        finally:
+            self._running_ids.discard(job.id)
@@ -1,13 +1,19 @@
 import asyncio
 import discord
 import logging
+import time
 from datetime import datetime
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.mongodb import MongoDBJobStore
-from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 import db
-from db.dbmanager import client as dbclient
-from config import SCHEDULER_MISFIRE_GRACE_TIME, SCHEDULER_MAX_INSTANCES, RATE_LIMIT_DELAY
+from utils.reminder_engine import ReminderEngine
+from utils.rate_limiter import TokenBucket
+from utils import dm_cache, metrics
+from utils.cluster import PROCESS_ID
+from config import (
+    SCHEDULER_MISFIRE_GRACE_TIME, SCHEDULER_COALESCE, REMINDER_MAX_CONCURRENT_DELIVERIES,
+    REMINDER_LOOKAHEAD_WINDOW, REMINDER_WINDOW_REFRESH_INTERVAL, REMINDER_PAGE_SIZE, REMINDER_PREWARM_LEAD,
+    RECOVERY_CONCURRENCY, RECOVERY_DM_RATE, RECOVERY_DM_BURST, RECOVERY_ACK_BATCH_SIZE, RECOVERY_PROGRESS_INTERVAL,
+    REMINDER_CLAIM_LEASE
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +26,16 @@ def set_bot_instance(bot):
     _bot_instance = bot
 
 async def execute_task(user_id, reminder_title, reminder_description):
-    """Send a reminder message to a user via DM"""
+    """
+    Send a reminder message to a user via DM.
+
+    Returns:
+        bool: True if it was sent, False if the user can never receive it
+        (unknown user or DMs closed). Other errors are raised, so the
+        reminder is kept and retried.
+    """
     if not _bot_instance:
-        logger.error("Bot instance not set for scheduler task")
-        return
+        raise RuntimeError("Bot instance not set for scheduler task")
         
     reminder_embed = discord.Embed(
         title="⏰ Reminder",
@@ -39,116 +51,182 @@ async def execute_task(user_id, reminder_title, reminder_description):
     reminder_embed.set_footer(text="Reminder sent by Theseus Bot")
     
     try:
-        user = await _bot_instance.fetch_user(user_id)
-        
-        if user:
-            await user.send(embed=reminder_embed)
-            logger.info(f"Reminder sent to user: {user.global_name} (ID: {user_id})")
-        else:
-            logger.warning(f"User not found: {user_id}")
+        channel = await dm_cache.get_dm_channel(_bot_instance, user_id)
+        await channel.send(embed=reminder_embed)
+        logger.info(f"Reminder sent to user: {channel.recipient.global_name if channel.recipient else 'Unknown'} (ID: {user_id})")
+        return True
+    except discord.NotFound:
+        logger.warning(f"User not found: {user_id}")
+        return False
+    except discord.Forbidden:
+        logger.warning(f"Cannot DM user {user_id}, reminder dropped")
+        return False
     except Exception as e:
+        # Drop the cached channel in case it went stale
+        dm_cache.invalidate(user_id)
         logger.error(f"Error executing reminder task for user {user_id}: {e}")
+        raise
 
-def run_reminder_job(user_id: int, title: str, description: str):
-    """Synchronous wrapper for APScheduler to execute reminder task"""
-    try:
-        if not _bot_instance:
-            logger.error("Bot instance not set for scheduler job")
-            return
-            
-        future = asyncio.run_coroutine_threadsafe(
-            execute_task(user_id, title, description), _bot_instance.loop
-        )
-        # Wait for completion; raises if the coroutine fails
-        future.result()
-    except Exception as e:
-        # Re-raise so the scheduler marks the job as errored
-        raise e
+async def deliver_reminder(job):
+    """Reminder engine callback: claim the stored reminder, send the DM, then delete it"""
+    metrics.reminder_fire_lag_seconds.observe(max(0, time.time() - job.run_at))
+    # Every process schedules every reminder, the claim decides which one delivers it
+    reminder = await db.aio.reminder_ops.claim_reminder(job.id, PROCESS_ID, REMINDER_CLAIM_LEASE)
+    if not reminder:
+        logger.debug(f"Reminder {job.id} was already delivered, cancelled or claimed by another process")
+        return
+    
+    # A failed send raises and keeps the reminder, its claim lapses and a live process takes it over
+    await execute_task(reminder["userId"], reminder.get("title", "Reminder"), reminder.get("desc", ""))
+    await db.aio.reminder_ops.complete_reminder(job.id, PROCESS_ID)
+
+async def prewarm_reminder(job):
+    """Reminder engine callback: resolve the user's DM channel before the due time"""
+    if _bot_instance:
+        await dm_cache.prewarm(_bot_instance, job.user_id)
+
+async def load_reminder_window(scheduler, start, end):
+    """Page reminders due in [start, end) from MongoDB into the engine"""
+    after = None
+    loaded = 0
+    
+    while True:
+        page = await db.aio.reminder_ops.get_reminders_page(start, end, after, REMINDER_PAGE_SIZE)
+        for reminder in page:
+            scheduler.add_job(
+                reminder["time"],
+                reminder.get("userId"),
+                reminder.get("title", "Reminder"),
+                reminder.get("desc", ""),
+                job_id=reminder["job_id"]
+            )
+        
+        loaded += len(page)
+        if len(page) < REMINDER_PAGE_SIZE:
+            break
+        after = (page[-1]["time"], page[-1]["_id"])
+    
+    if loaded:
+        logger.debug(f"Loaded {loaded} reminders due before {end}")
 
 async def initialize_scheduler(bot):
-    """Set up the job scheduler with MongoDB persistence"""
+    """Set up the reminder engine and load pending reminders from MongoDB"""
     if hasattr(bot, 'scheduler'):
         return
         
     try:
-        bot.scheduler = BackgroundScheduler(
-            jobstores={
-                'default': MongoDBJobStore(
-                    client=dbclient, 
-                    database='theseusdb', 
-                    collection='apscheduler_jobs'
-                )
-            },
-            job_defaults={
-                'coalesce': True, 
-                'max_instances': SCHEDULER_MAX_INSTANCES,
-                'misfire_grace_time': SCHEDULER_MISFIRE_GRACE_TIME
-            }
+        scheduler = ReminderEngine(
+            deliver_reminder,
+            max_concurrency=REMINDER_MAX_CONCURRENT_DELIVERIES,
+            misfire_grace_time=SCHEDULER_MISFIRE_GRACE_TIME,
+            coalesce=SCHEDULER_COALESCE,
+            load_window=load_reminder_window,
+            lookahead=REMINDER_LOOKAHEAD_WINDOW,
+            window_refresh_interval=REMINDER_WINDOW_REFRESH_INTERVAL,
+            prewarm=prewarm_reminder,
+            prewarm_lead=REMINDER_PREWARM_LEAD
         )
         
-        bot.scheduler.start()
-        
-        # Register job completion handler
-        def _cleanup_completed_jobs(event):
-            try:
-                if hasattr(event, 'exception') and event.exception:
-                    logger.warning(f"Job {event.job_id} failed, keeping database record")
-                else:
-                    db.reminder_ops.remove_rem_doc(event.job_id)
-                    logger.debug(f"Cleaned up completed job {event.job_id}")
-            except Exception as e:
-                logger.error(f"Failed to cleanup job {event.job_id}: {e}")
-
-        bot.scheduler.add_listener(_cleanup_completed_jobs, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+        # Window starts at now, anything older is handled as missed
+        cutoff = int(time.time())
+        scheduler.horizon = cutoff
+        await scheduler.start()
+        bot.scheduler = scheduler
+        metrics.scheduler_queue_depth.set_function(lambda: scheduler.queue_depth)
         
-        # Handle any missed reminders
-        await process_missed_reminders(bot)
+        # Recover missed reminders in the background so normal traffic isn't held back
+        bot.recovery_task = asyncio.create_task(process_missed_reminders(cutoff))
         
         logger.info("Scheduler initialized successfully")
         
     except Exception as e:
         logger.error(f"Failed to initialize scheduler: {e}")
 
-async def process_missed_reminders(bot):
-    """Process reminders that were missed while bot was offline"""
-    try:
-        missed_reminders = db.reminder_ops.get_missed_reminders()
-        
-        if not missed_reminders:
-            logger.debug("No missed reminders found")
+async def process_missed_reminders(cutoff):
+    """
+    Deliver reminders that came due before cutoff while the bot was offline.
+
+    Reminders are streamed from MongoDB page by page into a bounded queue,
+    claimed and sent by RECOVERY_CONCURRENCY workers behind a token bucket,
+    and acknowledged with batched delete_many calls. Reminders whose send
+    failed with a transient error are left claimed, so the orphan takeover
+    retries them once the lease lapses.
+    """
+    queue = asyncio.Queue(maxsize=RECOVERY_CONCURRENCY * 2)
+    limiter = TokenBucket(RECOVERY_DM_RATE, RECOVERY_DM_BURST)
+    acks = []
+    stats = {"processed": 0, "failed": 0}
+    started = time.monotonic()
+    
+    async def flush_acks():
+        if not acks:
             return
-            
-        active_job_ids = {job.id for job in bot.scheduler.get_jobs()}
-        processed = 0
-        
-        for reminder in missed_reminders:
-            job_id = reminder.get("job_id")
-            if not job_id or job_id in active_job_ids:
-                continue
-                
-            user_id = reminder.get("userId")
-            title = reminder.get("title", "Reminder")
-            desc = reminder.get("desc", "")
-            
+        batch = acks[:]
+        acks.clear()
+        await db.aio.reminder_ops.remove_reminders(batch, PROCESS_ID)
+    
+    async def worker():
+        while True:
+            reminder = await queue.get()
             try:
+                if reminder is None:
+                    return
+                
+                # Another process starting up at the same time may be recovering it too
+                if not await db.aio.reminder_ops.claim_reminder(reminder["job_id"], PROCESS_ID, REMINDER_CLAIM_LEASE):
+                    continue
+                
                 # Send with missed indicator
-                missed_title = f"⏰ {title}"
-                missed_desc = f"{desc}\n\n*This reminder was delayed due to system downtime*"
+                missed_title = f"⏰ {reminder.get('title', 'Reminder')}"
+                missed_desc = f"{reminder.get('desc', '')}\n\n*This reminder was delayed due to system downtime*"
                 
-                await execute_task(user_id, missed_title, missed_desc)
-                db.reminder_ops.remove_rem_doc(job_id)
-                processed += 1
+                await limiter.acquire()
+                sent = await execute_task(reminder.get("userId"), missed_title, missed_desc)
+                # Undeliverable reminders are acked too, retrying can't reach the user.
+                # Sends that raised are not acked and are retried once their claim lapses
+                acks.append(reminder["job_id"])
+                stats["processed" if sent else "failed"] += 1
                 
-                # Rate limiting to avoid overwhelming Discord API
-                if processed % 5 == 0:
-                    await asyncio.sleep(RATE_LIMIT_DELAY)
-                    
+                if len(acks) >= RECOVERY_ACK_BATCH_SIZE:
+                    await flush_acks()
             except Exception as e:
-                logger.error(f"Failed to process missed reminder {job_id}: {e}")
-        
-        if processed > 0:
-            logger.info(f"Processed {processed} missed reminders")
+                stats["failed"] += 1
+                logger.error(f"Failed to process missed reminder {reminder.get('job_id')}: {e}")
+            finally:
+                queue.task_done()
+    
+    async def report_progress():
+        while True:
+            await asyncio.sleep(RECOVERY_PROGRESS_INTERVAL)
+            elapsed = time.monotonic() - started
+            logger.info(f"Missed reminder recovery: {stats['processed']} sent, {stats['failed']} failed ({stats['processed'] / elapsed:.1f}/s)")
+    
+    workers = [asyncio.create_task(worker()) for _ in range(RECOVERY_CONCURRENCY)]
+    reporter = asyncio.create_task(report_progress())
+    
+    try:
+        after = None
+        while True:
+            page = await db.aio.reminder_ops.get_reminders_page(0, cutoff, after, REMINDER_PAGE_SIZE)
+            for reminder in page:
+                await queue.put(reminder)
             
+            if len(page) < REMINDER_PAGE_SIZE:
+                break
+            after = (page[-1]["time"], page[-1]["_id"])
     except Exception as e:
         logger.error(f"Error processing missed reminders: {e}")
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        reporter.cancel()
+        await flush_acks()
+    
+    elapsed = time.monotonic() - started
+    if stats["processed"] or stats["failed"]:
+        logger.info(f"Processed {stats['processed']} missed reminders ({stats['failed']} failed) in {elapsed:.1f}s, {stats['processed'] / elapsed:.1f}/s")
+    else:
+        logger.debug("No missed reminders found")
     
+    return stats
@@ -0,0 +1,124 @@
+"""
+Event loop lag watchdog
+
+A task on the loop wakes every `interval` seconds and records how late it
+was scheduled. A separate thread checks that the task keeps ticking; once
+the loop has been stuck for longer than `stall_threshold`, it samples the
+loop thread's stack so the blocking call can be identified. Samples are
+aggregated by collapsed stack and the worst offenders are logged
+periodically.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Frames under this directory are ours, used to name the offending call site
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _frame_label(frame):
+    return f"{os.path.basename(frame.filename)}:{frame.name}:{frame.lineno}"
+
+def collapse_stack(frame):
+    """Render a frame's stack root-first as a ';'-joined collapsed stack"""
+    return ";".join(_frame_label(entry) for entry in traceback.extract_stack(frame))
+
+def project_frame(frame):
+    """The innermost stack entry that belongs to this repository, e.g. PollButton.py:_vote:42"""
+    for entry in reversed(traceback.extract_stack(frame)):
+        if entry.filename.startswith(PROJECT_ROOT) and "site-packages" not in entry.filename:
+            return _frame_label(entry)
+    return "unknown"
+
+class LoopWatchdog:
+    def __init__(self, interval=0.1, stall_threshold=0.25, report_interval=300, max_stacks=200):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.report_interval = report_interval
+        self.max_stacks = max_stacks
+        self.stacks = Counter()  # collapsed stack -> samples taken while stalled
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._last_tick = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def start(self):
+        if self._task is not None:
+            return
+        
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+    
+    def top(self, limit=10):
+        return self.stacks.most_common(limit)
+    
+    async def _tick(self):
+        last_report = time.monotonic()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_tick = now
+            
+            lag = max(0.0, now - expected)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.loop_lag_seconds.set(lag)
+            metrics.loop_lag_histogram.observe(lag)
+            
+            if now - last_report >= self.report_interval:
+                last_report = now
+                self._report()
+    
+    def _watch(self):
+        in_stall = False
+        while not self._stop.wait(self.interval):
+            stalled_for = time.monotonic() - self._last_tick
+            if stalled_for < self.stall_threshold:
+                in_stall = False
+                continue
+            
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            
+            # Keep sampling while the stall lasts, but log it once
+            self._record(collapse_stack(frame))
+            if not in_stall:
+                in_stall = True
+                self.stalls += 1
+                metrics.loop_stalls_total.inc()
+                logger.warning(f"Event loop blocked for {stalled_for * 1000:.0f}ms in {project_frame(frame)}")
+    
+    def _record(self, stack):
+        self.stacks[stack] += 1
+        if len(self.stacks) > self.max_stacks:
+            # Drop the rarest half so memory stays bounded
+            self.stacks = Counter(dict(self.stacks.most_common(self.max_stacks // 2)))
+    
+    def _report(self):
+        if not self.stacks:
+            return
+        
+        # Innermost frames are the most telling part of each stack
+        lines = [f"{count:>5}  {';'.join(stack.split(';')[-4:])}" for stack, count in self.top(5)]
+        logger.warning(f"Loop stall hot spots ({self.stalls} stalls, max lag {self.max_lag * 1000:.0f}ms):\n" + "\n".join(lines))